@@ -0,0 +1,216 @@
+import io
+import sys
+import asyncio
+
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+from app import app
+from extensions import db
+from routing import engine_options, choose_replica
+
+# ASGI entry point, serving the read endpoints asynchronously:
+#   uvicorn asgi:application --workers 2
+#
+# A request to one of ASYNC_ENDPOINTS is dispatched to the Flask app inside a
+# SQLAlchemy greenlet (AsyncSession.run_sync) with db.session bound to the
+# session of an async engine. The view code is unchanged, but each statement
+# it issues awaits the async driver (asyncpg, aiosqlite) rather than blocking
+# a thread, so while a slow search waits on the database the event loop
+# serves other requests, and one process holds hundreds of them at once.
+# Page cache, metrics and templates behave as under WSGI. Every other request
+# (the writes) runs on the WSGI app in the default thread pool, as before,
+# with its request body and its response streamed, so uploads (e.g. show
+# imports) and downloads (api_export) are never held in memory as a whole.
+
+ASYNC_ENDPOINTS = {
+    'main.search_venues', 'main.search_artists', 'main.shows', 'main.show_venue', 'main.venue_availability',
+    'main.show_artist', 'main.api_artists', 'main.api_show_artist', 'main.api_venues', 'main.api_show_venue',
+    'main.api_shows', 'main.api_show_show', 'main.venues_nearby',
+}
+
+# Async driver per database backend
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+def async_database_uri(uri):
+    url = make_url(uri)
+    return str(url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]))
+
+def create_engine(uri, config):
+    return create_async_engine(uri, **engine_options(make_url(uri).get_backend_name(), config['SQLALCHEMY_ENGINE_OPTIONS']))
+
+class AsyncRoutingSession(Session):
+    # Routes reads to a replica like routing.RoutingSession, between the
+    # async engines of the class' subclass
+    primary = None
+    replicas = []
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        engine = choose_replica(self.replicas) or self.primary
+        return engine.sync_engine
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+class BodyStream(io.RawIOBase):
+    # Request body read by the WSGI app's thread, receiving the messages on
+    # the event loop as it reads
+    def __init__(self, receive, loop):
+        self.receive = receive
+        self.loop = loop
+        self.chunk = b''
+        self.more_body = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.chunk and self.more_body:
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            self.chunk = message.get('body', b'')
+            self.more_body = message.get('more_body', False)
+        size = min(len(buffer), len(self.chunk))
+        buffer[:size] = self.chunk[:size]
+        self.chunk = self.chunk[size:]
+        return size
+
+def build_environ(scope, body):
+    # body is the wsgi.input stream
+    # WSGI environ of an ASGI http scope
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # Bodies end with the stream, chunked ones included
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+class AsyncReadApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        self.engine = create_engine(config.get('ASYNC_DATABASE_URI') or async_database_uri(config['SQLALCHEMY_DATABASE_URI']), config)
+        self.replicas = [create_engine(async_database_uri(uri), config) for uri in config.get('SQLALCHEMY_REPLICA_URIS') or []]
+        self.session_class = type('AsyncRoutingSession', (AsyncRoutingSession,), {
+            'primary': self.engine, 'replicas': self.replicas,
+        })
+        self.urls = flask_app.url_map
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if self.endpoint(scope) in ASYNC_ENDPOINTS:
+                await self.read(build_environ(scope, io.BytesIO(await read_body(receive))), send)
+            else:
+                await self.write(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope {scope['type']!r}")
+
+    def endpoint(self, scope):
+        adapter = self.urls.bind('localhost', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, _ = adapter.match(scope['path'], scope['method'])
+        except (HTTPException, RequestRedirect):
+            return None
+        return endpoint
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for engine in [self.engine] + self.replicas:
+                    await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read(self, environ, send):
+        async with AsyncSession(sync_session_class=self.session_class, query_cls=db.Query) as session:
+            chunks = await session.run_sync(self.dispatch, environ)
+        for message in chunks:
+            await send(message)
+
+    def dispatch(self, session, environ):
+        # Runs in the greenlet of run_sync: db.session is scoped per greenlet,
+        # so the views of this request get the async engine's session. The
+        # app context teardown removes it again.
+        db.session.registry.set(session)
+        messages = []
+        self.run_wsgi(environ, messages.append)
+        return messages
+
+    async def write(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, io.BufferedReader(BodyStream(receive, loop)))
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        await loop.run_in_executor(None, self.run_wsgi, environ, send_from_thread)
+
+    def run_wsgi(self, environ, send):
+        # Runs the WSGI app, passing its response to send as ASGI messages
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        def send_start():
+            status, headers = started
+            send({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            })
+
+        result = self.flask_app.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    if started:
+                        send_start()
+                        started.clear()
+                    send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        if started:
+            send_start()
+        send({'type': 'http.response.body', 'body': b''})
+
+application = AsyncReadApp(app)
@@ -0,0 +1,159 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+import posixpath
+
+from flask import current_app, request, send_file, url_for, abort
+from werkzeug.utils import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fingerprinted static assets. The build (build_assets.py) copies every file
+# of static/ to ASSETS_DIR under a name carrying the hash of its content,
+# e.g. css/main.css -> css/main.3f9a0c1d2e4b.css, next to gzip (.gz) and
+# brotli (.br) variants of the compressible ones, and records the names in
+# ASSETS_DIR/manifest.json. asset_url_for() in the templates is url_for()
+# pointing the static files of the manifest to /assets/, which serves them
+# precompressed when the client accepts it and lets clients keep them for a
+# year without revalidating: a changed file gets a new name. Without a build
+# asset_url_for() is plain url_for() and static/ is served as before.
+
+# Hex digits of the content hash in the names
+HASH_LENGTH = 12
+
+# Extensions of the files worth compressing, the others (images, woff) are
+# compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot'}
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+MANIFEST = 'manifest.json'
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+def fingerprint(path, content):
+    root, extension = os.path.splitext(path)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{extension}'
+
+def source_files(static_dir):
+    # Paths of the files of static_dir relative to it, less hidden files and
+    # the unminified copies of minified files
+    for directory, _, names in os.walk(static_dir):
+        for name in sorted(names):
+            root, extension = os.path.splitext(name)
+            if name.startswith('.'):
+                continue
+            if not root.endswith('.min') and os.path.exists(os.path.join(directory, f'{root}.min{extension}')):
+                continue
+            yield os.path.relpath(os.path.join(directory, name), static_dir).replace(os.sep, '/')
+
+def rewrite_css(path, content, manifest):
+    # Points the url() references of a stylesheet to the fingerprinted files
+    base = posixpath.dirname(path)
+
+    def replace(match):
+        quote, reference = match.groups()
+        target, suffix = re.match(r'([^?#]*)(.*)', reference, re.S).groups()
+        if ':' in target or target.startswith('/'):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(base, target))
+        if resolved not in manifest:
+            return match.group(0)
+        return f'url({quote}{posixpath.relpath(manifest[resolved], base)}{suffix}{quote})'
+
+    return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+def compressors():
+    yield '.gz', lambda content: gzip.compress(content, 9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda content: brotli.compress(content, quality=11)
+
+def write_file(path, content):
+    # Written aside and renamed, a running server never reads a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as output:
+        output.write(content)
+    os.replace(path + '.tmp', path)
+
+def build(static_dir, output_dir):
+    # Returns the manifest and the number of files written. Files of earlier
+    # builds are kept, so pages cached before still find their assets, and
+    # unchanged files are not written again.
+    manifest = {}
+    written = 0
+    # Stylesheets last, their references are rewritten to the other files
+    for path in sorted(source_files(static_dir), key=lambda path: path.endswith('.css')):
+        with open(os.path.join(static_dir, path), 'rb') as source:
+            content = source.read()
+        if path.endswith('.css'):
+            content = rewrite_css(path, content, manifest)
+        manifest[path] = fingerprint(path, content)
+        target = os.path.join(output_dir, manifest[path])
+        if os.path.exists(target):
+            continue
+        if os.path.splitext(path)[1] in COMPRESSIBLE:
+            for suffix, compress in compressors():
+                compressed = compress(content)
+                if len(compressed) < len(content):
+                    write_file(target + suffix, compressed)
+                    written += 1
+        # The plain file last, its presence marks the asset built
+        write_file(target, content)
+        written += 1
+    write_file(os.path.join(output_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest, written
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {}
+
+class Assets:
+    def init_app(self, app):
+        # The manifest is read once, a new build is picked up on restart
+        directory = app.config.get('ASSETS_DIR') or os.path.join(app.root_path, 'assets')
+        app.extensions['assets'] = {'directory': directory, 'manifest': load_manifest(directory)}
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.send_asset)
+        app.add_template_global(self.url_for, 'asset_url_for')
+
+    def url_for(self, endpoint, **values):
+        if endpoint == 'static':
+            fingerprinted = current_app.extensions['assets']['manifest'].get(values.get('filename'))
+            if fingerprinted:
+                endpoint = 'assets'
+                values['filename'] = fingerprinted
+        return url_for(endpoint, **values)
+
+    def send_asset(self, filename):
+        path = safe_join(current_app.extensions['assets']['directory'], filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+                encoding = candidate
+                path += suffix
+                break
+        response = send_file(path, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        return response
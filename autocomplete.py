@@ -0,0 +1,264 @@
+import re
+import sys
+import time
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from flask import current_app
+
+# Type-ahead suggestions for the artist and venue names (/autocomplete). The
+# index holds one entry per distinct word of each name, sorted by word, so a
+# prefix is looked up with a bisection and its matches are the entries that
+# follow: "hop" finds "The Musical Hop" from its word "hop". A lookup reads
+# the index only, never the database, in microseconds at millions of names.
+#
+# Each process builds its index from the database on first use (gunicorn
+# builds it in the master before forking the workers, see gunicorn.conf.py).
+# The write handlers update the index of the process serving them at once.
+# Every AUTOCOMPLETE_REFRESH seconds the other processes read the names
+# created since, an id range read; names edited or deleted by another process
+# are picked up by the full rebuild every AUTOCOMPLETE_REBUILD seconds, both
+# in the background.
+
+WORD = re.compile(r'\w+')
+
+# Entries carry the id and the kind of their name in one integer code,
+# id * 2 + the position of the kind here
+KINDS = ('artist', 'venue')
+
+def words(text):
+    return WORD.findall(text.casefold())
+
+def encode(kind, id):
+    return id * 2 + KINDS.index(kind)
+
+def decode(code):
+    return KINDS[code & 1], code >> 1
+
+# Entries added since the build, up to this share of the built ones, before
+# they are merged into them
+MERGE_RATIO = 0.125
+MIN_MERGE_ENTRIES = 10000
+
+class NameIndex:
+    # The entries of the build are kept in two parallel sorted arrays, the
+    # words and the codes, ordered by (word, code); stale holds the codes
+    # whose built entries are out of date (edited or removed names). Entries
+    # added since are kept apart, in two small sorted lists, so an add never
+    # moves the built arrays; they are merged in once they outgrow
+    # MERGE_RATIO of them. last_ids maps each kind to the highest id read
+    # from the database.
+    def __init__(self):
+        self.words = []
+        self.codes = array('q')
+        self.stale = set()
+        self.added_words = []
+        self.added_codes = []
+        self.names = {}
+        self.last_ids = dict.fromkeys(KINDS, 0)
+
+    @classmethod
+    def build(cls, rows):
+        # rows are (kind, id, name) tuples
+        index = cls()
+        entries = []
+        append = entries.append
+        last_ids = index.last_ids
+        for kind, id, name in rows:
+            code = encode(kind, id)
+            index.names[code] = name
+            if id > last_ids[kind]:
+                last_ids[kind] = id
+            for word in set(words(name)):
+                # Words repeated across names are stored once
+                append((sys.intern(word), code))
+        entries.sort()
+        index.words = [word for word, _ in entries]
+        index.codes = array('q', [code for _, code in entries])
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, kind, id, name):
+        code = encode(kind, id)
+        self.remove(kind, id)
+        self.names[code] = name
+        for word in set(words(name)):
+            position = bisect_left(self.added_words, word)
+            end = bisect_right(self.added_words, word, position)
+            position = bisect_left(self.added_codes, code, position, end)
+            self.added_words.insert(position, sys.intern(word))
+            self.added_codes.insert(position, code)
+        if len(self.added_words) > max(len(self.words) * MERGE_RATIO, MIN_MERGE_ENTRIES):
+            self._merge()
+
+    def remove(self, kind, id):
+        code = encode(kind, id)
+        name = self.names.pop(code, None)
+        if name is None:
+            return
+        self.stale.add(code)
+        for word in set(words(name)):
+            position = bisect_left(self.added_words, word)
+            end = bisect_right(self.added_words, word, position)
+            position = bisect_left(self.added_codes, code, position, end)
+            if position < end and self.added_codes[position] == code:
+                del self.added_words[position]
+                del self.added_codes[position]
+
+    def _merge(self):
+        # One pass over the built entries, the added ones are sorted already
+        stale = self.stale
+        entries = [(word, code) for word, code in zip(self.words, self.codes) if code not in stale]
+        entries.extend(zip(self.added_words, self.added_codes))
+        entries.sort()
+        self.words = [word for word, _ in entries]
+        self.codes = array('q', [code for _, code in entries])
+        self.stale = set()
+        self.added_words = []
+        self.added_codes = []
+
+    def _entries(self, probe, scan_limit):
+        # Codes of the entries whose word starts with probe, built and added
+        # ones merged in (word, code) order, reading at most scan_limit
+        words, codes, stale = self.words, self.codes, self.stale
+        added_words, added_codes = self.added_words, self.added_codes
+        position = bisect_left(words, probe)
+        added = bisect_left(added_words, probe)
+        for _ in range(scan_limit):
+            built = position < len(words) and words[position].startswith(probe)
+            if added < len(added_words) and added_words[added].startswith(probe) and (
+                not built or (added_words[added], added_codes[added]) < (words[position], codes[position])
+            ):
+                yield added_codes[added]
+                added += 1
+            elif built:
+                code = codes[position]
+                position += 1
+                if code not in stale:
+                    yield code
+            else:
+                return
+
+    def suggest(self, term, limit, scan_limit):
+        # Names having a word starting with each word of term. The longest
+        # word of term is looked up, the others filter its matches, reading
+        # at most scan_limit entries. Returns (kind, id, name) tuples.
+        terms = words(term)
+        if not terms:
+            return []
+        probe = max(terms, key=len)
+        others = [other for other in terms if other != probe]
+        suggestions = []
+        seen = set()
+        for code in self._entries(probe, scan_limit):
+            if code in seen:
+                continue
+            seen.add(code)
+            name = self.names[code]
+            if others:
+                name_words = words(name)
+                if not all(any(word.startswith(other) for word in name_words) for other in others):
+                    continue
+            suggestions.append(decode(code) + (name,))
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+class Autocomplete:
+    def __init__(self):
+        self.loader = None
+        self.refresh = 60
+        self.rebuild = 6 * 3600
+        self.scan_limit = 2000
+        self._index = None
+        self._built_at = 0
+        self._refreshed_at = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # Writes made while a background job runs, replayed on its result
+        self._pending = None
+
+    def init_app(self, app, loader):
+        # loader(after) returns the (kind, id, name) of every name, or with
+        # after of the names whose id is above after[kind], read in an app
+        # context
+        self.loader = loader
+        self.refresh = app.config.get('AUTOCOMPLETE_REFRESH', 60)
+        self.rebuild = app.config.get('AUTOCOMPLETE_REBUILD', 6 * 3600)
+        self.scan_limit = app.config.get('AUTOCOMPLETE_SCAN_LIMIT', 2000)
+
+    def load(self):
+        # Builds the index unless built already
+        with self._build_lock:
+            if self._index is None:
+                index = NameIndex.build(self.loader())
+                with self._lock:
+                    self._index = index
+                    self._built_at = self._refreshed_at = time.time()
+
+    def _replay(self, index):
+        for operation, args in self._pending:
+            getattr(index, operation)(*args)
+
+    def _rebuild(self, app):
+        try:
+            with app.app_context():
+                index = NameIndex.build(self.loader())
+            with self._lock:
+                self._replay(index)
+                self._index = index
+                self._built_at = self._refreshed_at = time.time()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _catch_up(self, app):
+        # Adds the names created by the other processes since the last read
+        try:
+            index = self._index
+            with app.app_context():
+                rows = list(self.loader(dict(index.last_ids)))
+            with self._lock:
+                for kind, id, name in rows:
+                    index.add(kind, id, name)
+                    index.last_ids[kind] = max(index.last_ids[kind], id)
+                # Local writes of these names are newer than the rows read
+                self._replay(index)
+                self._refreshed_at = time.time()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def suggest(self, term, limit):
+        if self._index is None:
+            self.load()
+        with self._lock:
+            if self._pending is None:
+                now = time.time()
+                job = None
+                if now - self._built_at > self.rebuild:
+                    job = self._rebuild
+                elif now - self._refreshed_at > self.refresh:
+                    job = self._catch_up
+                if job is not None:
+                    self._pending = []
+                    threading.Thread(target=job, args=(current_app._get_current_object(),), daemon=True).start()
+            return self._index.suggest(term, limit, self.scan_limit)
+
+    def _write(self, operation, *args):
+        # Writes before the first build are read by it
+        with self._lock:
+            if self._index is None:
+                return
+            getattr(self._index, operation)(*args)
+            if self._pending is not None:
+                self._pending.append((operation, args))
+
+    def add(self, kind, id, name):
+        self._write('add', kind, id, name)
+
+    def remove(self, kind, id):
+        self._write('remove', kind, id)
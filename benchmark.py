@@ -0,0 +1,277 @@
+import io
+import os
+import sys
+import time
+import random
+import tempfile
+import subprocess
+import click
+
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect
+from app import app
+from extensions import db, page_cache, autocomplete
+from models import Artist, Venue, Show
+import seed_database
+
+# Route level benchmark: seeds a database at a given scale, drives every route
+# of views.py through the Flask test client and reports latency percentiles and
+# SQL statement counts per route. Fails when a route issues more statements
+# than its budget. Latencies are reported, not checked: they depend on the
+# machine. Also times the import of app.py against its budget.
+#
+#   FLASK_APP=benchmark.py flask benchmark --scale 100k
+
+SCALES = {
+    '1k': {'artists': 200, 'venues': 50, 'shows': 1000},
+    '100k': {'artists': 10000, 'venues': 2000, 'shows': 100000},
+    '1m': {'artists': 50000, 'venues': 10000, 'shows': 1000000},
+}
+
+# Statements a route may issue over the count it is listed with, so a
+# harmless extra query does not fail the run while an N+1 query, growing with
+# the rows of a page, still does. Routes listed with none must issue none.
+STATEMENT_MARGIN = 2
+
+# Seconds a fresh interpreter takes to import app.py, which creates the app,
+# the median of BOOT_RUNS. A preloading server pays it once, others once per
+# worker.
+BOOT_BUDGET_SECONDS = 1.0
+BOOT_RUNS = 5
+BOOT_SCRIPT = 'import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)'
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+def venue_form(ids):
+    return {
+        'name': 'Benchmark Venue', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main Street',
+        'phone': '', 'genres': ['Jazz', 'Blues'], 'image_link': '', 'facebook_link': '', 'website': '',
+        'seeking_description': '',
+    }
+
+def artist_form(ids):
+    return {
+        'name': 'Benchmark Artist', 'city': 'San Francisco', 'state': 'CA', 'phone': '',
+        'genres': ['Jazz', 'Blues'], 'image_link': '', 'facebook_link': '', 'website': '',
+        'seeking_description': '',
+    }
+
+def show_form(ids):
+    return {'artist_id': ids['artist_id'], 'venue_id': ids['venue_id'], 'start_time': ids['start_time'], 'duration': '120'}
+
+def free_show_slot(ids):
+    # A start time after every show of the artist and the venue, so the
+    # listed show does not conflict
+    last_end_time = db.session.query(db.func.max(Show.end_time)).filter(
+        db.or_(Show.artist_id == ids['artist_id'], Show.venue_id == ids['venue_id'])
+    ).scalar()
+    return {'start_time': str(max(last_end_time or datetime.min, datetime(2040, 1, 1, 20)) + timedelta(days=1))}
+
+def import_file(ids):
+    # Three shows on the days after the free slot
+    start_time = datetime.fromisoformat(ids['start_time'])
+    lines = ['artist_id,venue_id,start_time,duration'] + [
+        f"{ids['artist_id']},{ids['venue_id']},{start_time + timedelta(days=day)},120" for day in range(3)
+    ]
+    return {'file': (io.BytesIO('\n'.join(lines).encode()), 'shows.csv')}
+
+def create_venue(ids):
+    # A venue without shows for the DELETE route to remove
+    venue = Venue(name='Benchmark Venue', city='San Francisco', state='CA')
+    db.session.add(venue)
+    db.session.commit()
+    return {'venue_id': venue.id}
+
+def autocomplete_index(ids):
+    # Built before the timed requests, as gunicorn builds it before forking
+    autocomplete.load()
+    return {}
+
+def api_etag(ids):
+    # If-None-Match of the artist's current ETag: the unchanged resource must
+    # be answered with a 304
+    response = app.test_client().get(f"/api/v1/artists/{ids['artist_id']}")
+    return {'headers': {'If-None-Match': response.headers['ETag']}, 'status': 304}
+
+def export_window(ids):
+    # The shows of the next 30 days, a slice of the same size at every scale
+    start_time = datetime.now().replace(microsecond=0)
+    return {'from': start_time.isoformat(), 'to': (start_time + timedelta(days=30)).isoformat()}
+
+# name, method, url, form data, setup (untimed, returns extra ids, and may
+# return the request 'headers' and the expected response 'status'),
+# statements. Statements are the SQL statements a request issues today, see
+# STATEMENT_MARGIN, and must not grow with the data.
+ROUTES = [
+    ('index', 'GET', '/', None, None, 0),
+    ('venues', 'GET', '/venues', None, None, 1),
+    ('venues by genre', 'GET', '/venues?genre=Jazz', None, None, 1),
+    ('search venues', 'POST', '/venues/search', lambda ids: {'search_term': 'the'}, None, 1),
+    ('show venue', 'GET', '/venues/{venue_id}', None, None, 2),
+    ('venues nearby', 'GET', '/venues/nearby?lat=40.7128&lng=-74.0060&radius=25&genre=Jazz&upcoming=1', None, None, 4),
+    ('venue availability', 'GET', '/venues/{venue_id}/availability', None, None, 2),
+    ('venue suggestions', 'GET', '/venues/{venue_id}/suggested-artists', None, None, 2),
+    ('create venue form', 'GET', '/venues/create', None, None, 0),
+    ('create venue', 'POST', '/venues/create', venue_form, None, 2),
+    ('edit venue form', 'GET', '/venues/{venue_id}/edit', None, None, 2),
+    ('edit venue', 'POST', '/venues/{venue_id}/edit', venue_form, None, 5),
+    ('delete venue', 'DELETE', '/venues/{venue_id}', None, create_venue, 8),
+    ('artists', 'GET', '/artists', None, None, 1),
+    ('artists by genre', 'GET', '/artists?genre=Jazz', None, None, 1),
+    ('search artists', 'POST', '/artists/search', lambda ids: {'search_term': 'the'}, None, 3),
+    ('autocomplete', 'GET', '/autocomplete?q=the', None, autocomplete_index, 0),
+    ('show artist', 'GET', '/artists/{artist_id}', None, None, 2),
+    ('artist suggestions', 'GET', '/artists/{artist_id}/suggested-venues', None, None, 2),
+    ('create artist form', 'GET', '/artists/create', None, None, 0),
+    ('create artist', 'POST', '/artists/create', artist_form, None, 2),
+    ('edit artist form', 'GET', '/artists/{artist_id}/edit', None, None, 2),
+    ('edit artist', 'POST', '/artists/{artist_id}/edit', artist_form, None, 5),
+    ('shows', 'GET', '/shows', None, None, 1),
+    ('create show form', 'GET', '/shows/create', None, None, 0),
+    ('create show', 'POST', '/shows/create', show_form, free_show_slot, 7),
+    ('import shows form', 'GET', '/shows/import', None, None, 0),
+    ('import shows', 'POST', '/shows/import', import_file, free_show_slot, 9),
+    ('api artists', 'GET', '/api/v1/artists', None, None, 3),
+    ('api artist', 'GET', '/api/v1/artists/{artist_id}', None, None, 2),
+    # The page cache is disabled, so the 304 is still rendered first: the
+    # route checks the answer, not the saving
+    ('api artist 304', 'GET', '/api/v1/artists/{artist_id}', None, api_etag, 2),
+    ('api venues', 'GET', '/api/v1/venues', None, None, 2),
+    ('api venue', 'GET', '/api/v1/venues/{venue_id}', None, None, 2),
+    ('api shows', 'GET', '/api/v1/shows', None, None, 1),
+    ('api show', 'GET', '/api/v1/shows/{show_id}', None, None, 1),
+    ('metrics', 'GET', '/metrics', None, None, 0),
+    ('export artists', 'GET', '/api/v1/export/artists?format=csv', None, None, 1),
+    ('export shows', 'GET', '/api/v1/export/shows?gzip=1&from={from}&to={to}', None, export_window, 1),
+]
+
+#----------------------------------------------------------------------------#
+# Running.
+#----------------------------------------------------------------------------#
+
+def seed(scale, reseed):
+    counts = SCALES[scale]
+    if not reseed and 'Show' in inspect(db.engine).get_table_names():
+        if Show.query.count() >= counts['shows']:
+            return
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(0)
+    seed_database.load_all(
+        seed_database.generate_artists(counts['artists'], rng),
+        seed_database.generate_venues(counts['venues'], rng),
+        seed_database.generate_shows(counts['shows'], counts['artists'], counts['venues'], rng),
+        check_conflicts=False,
+    )
+
+def busiest_ids():
+    # The venue and the artist with the most shows, the worst case of their
+    # pages, and a show of the venue
+    venue_id = db.session.query(Show.venue_id).group_by(Show.venue_id).order_by(db.func.count(Show.id).desc()).limit(1).scalar()
+    artist_id = db.session.query(Show.artist_id).group_by(Show.artist_id).order_by(db.func.count(Show.id).desc()).limit(1).scalar()
+    show_id = db.session.query(Show.id).filter(Show.venue_id == venue_id).limit(1).scalar()
+    db.session.remove()
+    return {'venue_id': venue_id, 'artist_id': artist_id, 'show_id': show_id}
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+def run_route(client, counter, ids, method, url, data, setup, iterations):
+    timings = []
+    statements = 0
+    for _ in range(iterations):
+        route_ids = dict(ids)
+        if setup:
+            with app.app_context():
+                route_ids.update(setup(ids))
+        headers = route_ids.pop('headers', None)
+        status = route_ids.pop('status', None)
+        counter['statements'] = 0
+        started = time.perf_counter()
+        # Buffered, so streamed responses are read in full and closed
+        response = client.open(
+            url.format(**route_ids), method=method, data=data(route_ids) if data else None, headers=headers, buffered=True
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+        statements = max(statements, counter['statements'])
+        if response.status_code >= 500:
+            raise click.ClickException(f'{method} {url} failed with {response.status_code}')
+        if status and response.status_code != status:
+            raise click.ClickException(f'{method} {url} answered {response.status_code}, expected {status}')
+    return {
+        'p50': percentile(timings, 0.50),
+        'p95': percentile(timings, 0.95),
+        'p99': percentile(timings, 0.99),
+        'statements': statements,
+    }
+
+def measure_boot():
+    # Servers do not run from the flask command, which also loads Flask-Migrate
+    env = {name: value for name, value in os.environ.items() if name != 'FLASK_RUN_FROM_CLI'}
+    timings = []
+    for _ in range(BOOT_RUNS):
+        output = subprocess.run(
+            [sys.executable, '-c', BOOT_SCRIPT], cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.split()[-1]))
+    return percentile(timings, 0.50)
+
+def statement_budget(statements):
+    return statements + STATEMENT_MARGIN if statements else 0
+
+@app.cli.command('benchmark')
+@click.option('--scale', type=click.Choice(list(SCALES)), default='1k', show_default=True)
+@click.option('--database-uri', default=None, help='Database to seed and benchmark, a SQLite file by default')
+@click.option('--reseed', is_flag=True, help='Reseed even if the database already holds the scale')
+@click.option('--iterations', default=20, show_default=True)
+@click.option('--route', 'only', multiple=True, help='Only benchmark the named routes')
+def benchmark(scale, database_uri, reseed, iterations, only):
+    # The page cache is disabled so every request reaches the database
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri or 'sqlite:///' + os.path.join(
+        tempfile.gettempdir(), f'fyyur-benchmark-{scale}.db'
+    )
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['CACHE_TYPE'] = 'null'
+    page_cache.init_app(app)
+
+    with app.app_context():
+        seed(scale, reseed)
+        ids = busiest_ids()
+        counter = {'statements': 0}
+
+        def count_statement(*args):
+            counter['statements'] += 1
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+
+    client = app.test_client()
+    failures = []
+    for name, method, url, data, setup, statements in ROUTES:
+        if only and name not in only:
+            continue
+        result = run_route(client, counter, ids, method, url, data, setup, iterations)
+        budget = statement_budget(statements)
+        click.echo(
+            f"{name:<20} p50 {result['p50']:8.2f}ms  p95 {result['p95']:8.2f}ms  p99 {result['p99']:8.2f}ms"
+            f"  statements {result['statements']:4d} (budget {budget})"
+        )
+        if result['statements'] > budget:
+            failures.append(f"{name}: {result['statements']} statements, budget is {budget}")
+
+    if not only:
+        boot = measure_boot()
+        click.echo(f'{"boot":<20} p50 {boot * 1000:8.2f}ms  (budget {BOOT_BUDGET_SECONDS * 1000:.0f}ms)')
+        if boot > BOOT_BUDGET_SECONDS:
+            failures.append(f'boot: {boot * 1000:.0f}ms, budget is {BOOT_BUDGET_SECONDS * 1000:.0f}ms')
+
+    for failure in failures:
+        click.echo(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    app.cli()
@@ -0,0 +1,23 @@
+import shutil
+import click
+
+from app import app
+from assets import build, brotli
+
+# Builds the fingerprinted and precompressed static assets served at /assets/
+# (see assets.py). Run it on deploy, before the app starts:
+#   FLASK_APP=build_assets.py flask build_assets
+
+@app.cli.command('build_assets')
+@click.option('--clean', is_flag=True, help='Remove the files of earlier builds first')
+def build_assets(clean):
+    directory = app.extensions['assets']['directory']
+    if clean:
+        shutil.rmtree(directory, ignore_errors=True)
+    manifest, written = build(app.static_folder, directory)
+    click.echo(f'Built {len(manifest)} assets into {directory}, {written} files written')
+    if brotli is None:
+        click.echo('brotli is not installed, only gzip variants were written', err=True)
+
+if __name__ == '__main__':
+    app.cli()
@@ -0,0 +1,295 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import io
+import os
+import sys
+import csv
+import json
+import zlib
+import codecs
+from itertools import islice
+from sqlalchemy import literal
+from werkzeug.datastructures import MultiDict
+from extensions import db, page_cache
+from forms import ShowForm
+from models import (
+    Artist,
+    ArtistGenre,
+    Bookings,
+    Show,
+    Venue,
+    VenueGenre,
+    add_to_feed,
+    count_shows,
+    describe_conflict,
+    show_duration,
+)
+
+from datetime import datetime
+
+#----------------------------------------------------------------------------#
+# Show import.
+#----------------------------------------------------------------------------#
+
+# Bulk import of shows from CSV files with a header row or NDJSON files, with
+# the fields of ShowForm: artist_id, venue_id, start_time (YYYY-MM-DD
+# HH:MM:SS) and an optional duration in minutes. Records are imported as the
+# file is read, IMPORT_BATCH_SIZE at a time: a batch is validated with
+# ShowForm, resolves its artists and venues with a query per model, is
+# checked for booking conflicts in memory and is inserted in a transaction
+# of its own. Memory use is bounded by the batch size and the errors kept
+# for the report, IMPORT_MAX_ERRORS at most.
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+# Format by file extension or mimetype
+IMPORT_FORMATS = {
+    '.csv': 'csv',
+    'text/csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    'application/x-ndjson': 'ndjson',
+}
+
+def import_format(filename=None, mimetype=None):
+    extension = os.path.splitext(filename or '')[1].lower()
+    return IMPORT_FORMATS.get(extension) or IMPORT_FORMATS.get(mimetype)
+
+def read_import(stream, format):
+    # Records of a binary stream as dicts, None for the NDJSON lines that are
+    # not objects
+    text = codecs.getreader('utf-8-sig')(stream)
+    if format == 'csv':
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else None
+
+def import_row(form, record):
+    # (row, None) of a valid record, (None, errors) otherwise. The form is
+    # reused from record to record.
+    if record is None:
+        return None, {'record': ['Not a JSON object.']}
+    form.process(formdata=MultiDict((name, str(value)) for name, value in record.items() if name and value not in (None, '')))
+    if not form.validate():
+        return None, form.errors
+    return {
+        'artist_id': form.artist_id.data,
+        'venue_id': form.venue_id.data,
+        'start_time': form.start_time.data,
+        'end_time': form.start_time.data + show_duration(form.duration.data),
+    }, None
+
+def import_batch(rows):
+    # Inserts the rows of the (number, row) pairs that can be booked. Returns
+    # the inserted rows and the (number, errors) of the others.
+    artist_ids = {row['artist_id'] for _, row in rows}
+    venue_ids = {row['venue_id'] for _, row in rows}
+    # Locks the artists and the venues like the counters update of
+    # create_show, so concurrent bookings of them wait for this batch
+    artists = {artist_id for artist_id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids)).with_for_update()}
+    venues = {venue_id for venue_id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids)).with_for_update()}
+    bookings = Bookings()
+    bookings.load([row for _, row in rows if row['artist_id'] in artists and row['venue_id'] in venues])
+
+    inserted = []
+    errors = []
+    for number, row in rows:
+        row_errors = {}
+        if row['artist_id'] not in artists:
+            row_errors['artist_id'] = ['No artist has this id.']
+        if row['venue_id'] not in venues:
+            row_errors['venue_id'] = ['No venue has this id.']
+        if not row_errors:
+            conflicts = bookings.conflicts(row)
+            if conflicts:
+                row_errors['start_time'] = [
+                    describe_conflict(row['artist_id'], booked['artist_id'], booked['start_time'], booked['end_time'])
+                    for booked in conflicts
+                ]
+        if row_errors:
+            errors.append((number, row_errors))
+            continue
+        bookings.book(row)
+        inserted.append(row)
+
+    if inserted:
+        count_shows(inserted)
+        db.session.execute(Show.__table__.insert(), inserted)
+        # An artist plays one show at a time, so (artist_id, start_time)
+        # identifies the new shows
+        add_to_feed(
+            db.tuple_(Show.artist_id, Show.start_time).in_([(row['artist_id'], row['start_time']) for row in inserted]),
+            Show.start_time >= datetime.now()
+        )
+    return inserted, errors
+
+def import_shows(records, batch_size=IMPORT_BATCH_SIZE):
+    # Returns the report: the numbers of shows imported and of rows failed,
+    # and the errors of the first failed rows by row number
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+
+    def fail(number, errors):
+        report['failed'] += 1
+        if len(report['errors']) < IMPORT_MAX_ERRORS:
+            report['errors'].append({'row': number, 'errors': errors})
+
+    form = ShowForm(formdata=None, meta={'csrf': False})
+    numbered = enumerate(records, 1)
+    number = 0
+    while True:
+        read = 0
+        rows = []
+        try:
+            for number, record in islice(numbered, batch_size):
+                read += 1
+                row, errors = import_row(form, record)
+                if errors:
+                    fail(number, errors)
+                else:
+                    rows.append((number, row))
+        except (csv.Error, UnicodeDecodeError) as e:
+            # The rest of the file can not be read
+            fail(number + 1, {'record': [str(e)]})
+
+        if rows:
+            try:
+                inserted, errors = import_batch(rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(sys.exc_info())
+                inserted, errors = [], [(number, {'record': ['The batch of this row could not be imported.']}) for number, _ in rows]
+            for row_number, row_errors in errors:
+                fail(row_number, row_errors)
+            report['imported'] += len(inserted)
+            if inserted:
+                page_cache.invalidate(
+                    'shows', 'venues',
+                    *{f"artist:{row['artist_id']}" for row in inserted},
+                    *{f"venue:{row['venue_id']}" for row in inserted}
+                )
+        if read < batch_size:
+            report['errors'].sort(key=lambda error: error['row'])
+            return report
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+# Full dumps of the artists, venues or shows as CSV with a header row or as
+# NDJSON, optionally gzipped. Rows are read from a server-side cursor
+# (stream_results) EXPORT_BATCH_SIZE at a time, in the order of an index so
+# nothing is sorted first, and encoded into chunks of about
+# EXPORT_CHUNK_SIZE bytes as they arrive: a dump of any size uses constant
+# memory and its CSV header goes out, gzipped or not, before the first row
+# is fetched.
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_KINDS = ['artists', 'venues', 'shows']
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+def genre_list(genre_model, key):
+    # The genres of the row separated by ';', looked up through the primary
+    # key of the genre table
+    genre = db.cast(genre_model.genre, db.String)
+    if db.engine.dialect.name == 'postgresql':
+        genres = db.func.string_agg(genre, literal(';'))
+    else:
+        genres = db.func.group_concat(genre, literal(';'))
+    return db.select([genres]).where(key).scalar_subquery().label('genres')
+
+def export_select(kind, start_time=None, end_time=None):
+    # Shows may be restricted to a [start_time, end_time) range
+    if kind == 'artists':
+        return db.select([
+            Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+            genre_list(ArtistGenre, ArtistGenre.artist_id == Artist.id),
+            Artist.image_link, Artist.facebook_link, Artist.website,
+            Artist.seeking_venue, Artist.seeking_description,
+            Artist.upcoming_shows_count, Artist.past_shows_count,
+        ]).order_by(Artist.id)
+    if kind == 'venues':
+        return db.select([
+            Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.latitude, Venue.longitude, Venue.phone,
+            genre_list(VenueGenre, VenueGenre.venue_id == Venue.id),
+            Venue.image_link, Venue.facebook_link, Venue.website,
+            Venue.seeking_talent, Venue.seeking_description,
+            Venue.upcoming_shows_count, Venue.past_shows_count,
+        ]).order_by(Venue.id)
+    select = db.select([
+        Show.id, Show.start_time, Show.end_time,
+        Show.artist_id, Artist.name.label('artist_name'),
+        Show.venue_id, Venue.name.label('venue_name'),
+    ]).select_from(Show.__table__.join(Artist.__table__).join(Venue.__table__)).order_by(Show.start_time, Show.id)
+    if start_time is not None:
+        select = select.where(Show.start_time >= start_time)
+    if end_time is not None:
+        select = select.where(Show.start_time < end_time)
+    return select
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The header goes out on its own, before the first row is fetched
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        writer.writerow([export_value(value) for value in row])
+    yield buffer.getvalue()
+
+def ndjson_chunks(columns, rows):
+    # Genres are a list, like in the API
+    lines = []
+    size = 0
+    for row in rows:
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+        record = {name: export_value(value) for name, value in zip(columns, row)}
+        if 'genres' in record:
+            record['genres'] = record['genres'].split(';') if record['genres'] else []
+        lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+        size += len(lines[-1])
+    yield ''.join(lines)
+
+def gzip_chunks(chunks):
+    # The first chunk, e.g. the CSV header, is flushed through rather than
+    # held by the compressor
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for number, chunk in enumerate(chunks):
+        data = compressor.compress(chunk)
+        if not number:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_chunks(kind, format, compress=False, start_time=None, end_time=None):
+    # The dump as chunks of bytes. Nothing runs until the first chunk is
+    # taken, by the streamed response.
+    select = export_select(kind, start_time, end_time)
+    rows = db.session.execute(select.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+    encode = csv_chunks if format == 'csv' else ndjson_chunks
+    chunks = (chunk.encode() for chunk in encode(list(select.selected_columns.keys()), rows) if chunk)
+    yield from gzip_chunks(chunks) if compress else chunks
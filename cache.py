@@ -0,0 +1,351 @@
+import os
+import time
+import uuid
+import pickle
+import hashlib
+import itertools
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import click
+from flask import request, session, g, make_response
+from flask_wtf.csrf import generate_csrf
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+# Backends are bounded key/value stores with a per entry timeout (seconds).
+# get() returns None for missing or expired keys.
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+class LRUCache:
+    # In-process cache, evicting the least recently used entry when full
+    def __init__(self, max_entries=1000, default_timeout=300):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._entries[key] = (time.time() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Share of max_entries a FileSystemCache is pruned down to
+PRUNE_TO = 0.9
+
+class FileSystemCache:
+    # Cache shared by every worker on the host, one pickle file per entry.
+    # Files are replaced atomically. Every prune_interval writes of a process
+    # the directory is listed, and once it holds more than max_entries the
+    # oldest files are removed down to PRUNE_TO of max_entries, so the
+    # directory scans stay off most writes.
+    def __init__(self, directory, max_entries=5000, default_timeout=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self.prune_interval = max(max_entries // 20, 1)
+        self._writes = itertools.count(1)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as entry_file:
+                expires_at, value = pickle.load(entry_file)
+        except (OSError, EOFError, pickle.PickleError):
+            return None
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as entry_file:
+            pickle.dump((time.time() + timeout, value), entry_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        if next(self._writes) % self.prune_interval == 0:
+            self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _prune(self):
+        names = [name for name in os.listdir(self.directory) if not name.startswith('.tmp')]
+        if len(names) <= self.max_entries:
+            return
+        paths = [os.path.join(self.directory, name) for name in names]
+        stats = []
+        for path in paths:
+            try:
+                stats.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        stats.sort()
+        for _, path in stats[:len(stats) - int(self.max_entries * PRUNE_TO)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def create_backend(config):
+    cache_type = config.get('CACHE_TYPE', 'lru')
+    default_timeout = config.get('CACHE_DEFAULT_TIMEOUT', 300)
+    if cache_type == 'lru':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 1000), default_timeout)
+    if cache_type == 'filesystem':
+        directory = config.get('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'fyyur-cache')
+        return FileSystemCache(directory, config.get('CACHE_MAX_ENTRIES', 5000), default_timeout)
+    if cache_type == 'null':
+        return NullCache()
+    raise ValueError(f'Unknown CACHE_TYPE {cache_type!r}')
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Rendered pages are stored with the version token of each of their tags
+# (e.g. 'venues', 'venue:5'). invalidate() replaces the tokens of the given
+# tags, which makes every page stored under an old token stale, so the write
+# handlers evict exactly the pages they affect. Only the 'filesystem' backend
+# is shared by the workers; with 'lru' a write evicts the pages of the
+# process handling it, the others serve theirs until they expire. Tokens are random rather than counters so a token evicted from a
+# bounded backend can never be recreated with an old value. In-process
+# caches keep the tokens apart from the pages, in a store of CACHE_MAX_TAGS
+# entries, so storing pages and fragments does not evict them.
+
+# Stands in for the per-session CSRF token inside stored pages
+CSRF_PLACEHOLDER = '__fyyur_csrf_token__'
+
+TAG_TIMEOUT = 365 * 24 * 3600
+
+# Headers set by the views kept with the stored pages and sent again on hits
+# and 304s, e.g. the Cache-Control: no-cache of the JSON API
+STORED_HEADERS = ('Cache-Control', 'Vary')
+
+class PageCache:
+    def __init__(self, backend=None):
+        self.backend = backend or NullCache()
+        self.tag_backend = self.backend
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config)
+        self.tag_backend = self.backend
+        if isinstance(self.backend, LRUCache):
+            self.tag_backend = LRUCache(app.config.get('CACHE_MAX_TAGS', 50000), TAG_TIMEOUT)
+
+    @property
+    def shared(self):
+        # True when the pages live outside the process, so invalidate() from
+        # a CLI job reaches the running workers
+        return isinstance(self.backend, FileSystemCache)
+
+    def _tag_version(self, tag):
+        key = f'tag:{tag}'
+        version = self.tag_backend.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            self.tag_backend.set(key, version, timeout=TAG_TIMEOUT)
+        return version
+
+    def tag_versions(self, tags):
+        return [self._tag_version(tag) for tag in tags]
+
+    def get(self, key):
+        entry = self.backend.get(f'page:{key}')
+        if entry is None:
+            return None
+        versions, page = entry
+        for tag, version in versions.items():
+            if self._tag_version(tag) != version:
+                return None
+        return page
+
+    def set(self, key, page, tags=(), timeout=None):
+        versions = {tag: self._tag_version(tag) for tag in tags}
+        self.backend.set(f'page:{key}', (versions, page), timeout)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.tag_backend.set(f'tag:{tag}', uuid.uuid4().hex, timeout=TAG_TIMEOUT)
+
+    def invalidate_from_cli(self, *tags):
+        # invalidate() for the CLI jobs. Only a shared cache is reachable from
+        # their process, in-process caches serve the pages of the tags until
+        # they expire.
+        if self.shared:
+            self.invalidate(*tags)
+        else:
+            click.echo(f"The page cache is per process, cached {', '.join(tags)} pages update when they expire")
+
+    def cached(self, tags=lambda **view_args: [], timeout=None, etag=False):
+        # Caches the GET responses of a view. tags receives the view args and
+        # returns the tags of the page. Views may shorten the timeout of the
+        # page being rendered with expire_at(). With etag, responses carry an
+        # ETag of their body, stored with the page, and conditional GETs
+        # matching it are answered with 304.
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**view_args):
+                # Pages carrying flashed messages are never stored nor served
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(**view_args)
+                key = request.full_path
+                # Requests flagged page_cache_refresh render and store a
+                # fresh page (e.g. users who must read their own writes)
+                page = None if g.get('page_cache_refresh') else self.get(key)
+                if page is not None:
+                    body, content_type, page_etag, headers = page
+                    if page_etag and page_etag in request.if_none_match:
+                        # Answered from the stored etag, the body is not even read
+                        response = make_response('', 304)
+                        response.set_etag(page_etag)
+                    else:
+                        response = make_response(body.replace(CSRF_PLACEHOLDER, generate_csrf()))
+                        response.content_type = content_type
+                        if page_etag:
+                            response.set_etag(page_etag)
+                    response.headers.extend(headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                g.page_expires_at = None
+                response = make_response(view(**view_args))
+                page_etag = None
+                if etag and response.status_code == 200:
+                    response.add_etag()
+                    page_etag, _ = response.get_etag()
+                if response.status_code == 200 and not session.get('_flashes'):
+                    page_timeout = timeout
+                    if g.page_expires_at is not None:
+                        seconds = max(int(g.page_expires_at - time.time()), 0)
+                        page_timeout = seconds if page_timeout is None else min(page_timeout, seconds)
+                    if page_timeout != 0:
+                        body = response.get_data(as_text=True)
+                        token = g.get('csrf_token')
+                        if token:
+                            body = body.replace(token, CSRF_PLACEHOLDER)
+                        headers = [(name, value) for name, value in response.headers if name in STORED_HEADERS]
+                        self.set(key, (body, response.content_type, page_etag, headers), tags(**view_args), page_timeout)
+                response.headers['X-Cache'] = 'MISS'
+                if page_etag:
+                    response.make_conditional(request)
+                return response
+            return wrapper
+        return decorator
+
+def expire_at(moment):
+    # Expires the page being rendered no later than moment (a datetime),
+    # e.g. when its first upcoming show becomes a past show
+    timestamp = moment.timestamp()
+    if g.get('page_expires_at') is None or timestamp < g.page_expires_at:
+        g.page_expires_at = timestamp
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+# {% cache key, timeout[, tags] %}...{% endcache %} stores the rendered
+# block, e.g. a show tile, under its template, line and key plus the page
+# cache version tokens of its tags (default [key]). The invalidate() calls
+# of the write handlers replace those tokens, so an edited artist or venue
+# gets its tiles rendered again on every page. Fragments are kept in an
+# in-process LRU of FRAGMENT_CACHE_MAX_ENTRIES entries, even when the pages
+# are shared on the filesystem: a tile is cheaper to render than to unpickle.
+
+class FragmentCache:
+    def __init__(self, page_cache):
+        self.page_cache = page_cache
+        self.backend = NullCache()
+
+    def init_app(self, app):
+        self.backend = NullCache()
+        if app.config.get('CACHE_TYPE', 'lru') != 'null':
+            self.backend = LRUCache(
+                app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000),
+                app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+            )
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+    def render(self, site, key, timeout, tags, caller):
+        versions = self.page_cache.tag_versions([key] if tags is None else tags)
+        fragment_key = ':'.join([site, str(key)] + versions)
+        fragment = self.backend.get(fragment_key)
+        if fragment is None:
+            fragment = caller()
+            self.backend.set(fragment_key, fragment, timeout)
+        return fragment
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # Fragments of different blocks never share a key
+        args = [nodes.Const(f'{parser.name}:{lineno}'), parser.parse_expression()]
+        parser.stream.expect('comma')
+        args.append(parser.parse_expression())
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, site, key, timeout, tags, caller):
+        return self.environment.fragment_cache.render(site, key, timeout, tags, caller)
@@ -1,12 +1,76 @@
 import os
+from flask.helpers import get_debug_flag
 
-SECRET_KEY = os.urandom(32)
+# Signs sessions and CSRF tokens. Every worker and every restart must share
+# it, so it comes from the environment (see create_app() in app.py).
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Debug mode, only with FLASK_ENV=development or FLASK_DEBUG=1. Off by
+# default, so a missing SECRET_KEY stops any other run (see create_app()).
+DEBUG = get_debug_flag()
 
 # Connect to the database
 SQLALCHEMY_DATABASE_URI = 'postgres://postgres:<your_password_here>@localhost:5432/fyyur'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Read replicas serving the GET requests, the primary above serves the
+# writes. Try it locally with a copy of the database, e.g.
+# ['sqlite:////tmp/fyyur-replica.db'] next to 'sqlite:////tmp/fyyur.db'.
+SQLALCHEMY_REPLICA_URIS = []
+# Seconds a user reads from the primary after their own write
+READ_YOUR_WRITES_SECONDS = 10
+
+# Pools of every engine, per worker process (pool settings are ignored on
+# SQLite). Connections are checked before use and replaced after 30 minutes,
+# before Postgres or a proxy drops them.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 10,
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+}
+
+# Rows per page of the keyset paginated listing and search pages
+PAGE_SIZE = 50
+
+# Page cache of the read pages: 'lru', 'filesystem' (shared by the workers
+# of a host, stored in CACHE_DIR) or 'null' (disabled). 'lru' is for single
+# process runs only: each process keeps its own pages, and the writes handled
+# by one worker never evict the pages of the others. gunicorn.conf.py
+# defaults the environment variable to 'filesystem'.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_DIR = os.environ.get('CACHE_DIR')
+CACHE_MAX_ENTRIES = 1000
+CACHE_DEFAULT_TIMEOUT = 300
+# Version tokens of the cache tags kept by the 'lru' cache
+CACHE_MAX_TAGS = 50000
+# Rendered show tiles kept per process ({% cache %} in the templates)
+FRAGMENT_CACHE_MAX_ENTRIES = 5000
+
+# Suggestions of /autocomplete: default number returned, index entries read
+# per lookup at most, seconds between the reads of the names created by the
+# other processes, and seconds between the full rebuilds of the index of a
+# process, which pick up the names they edited or deleted
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_SCAN_LIMIT = 2000
+AUTOCOMPLETE_REFRESH = 60
+AUTOCOMPLETE_REBUILD = 6 * 3600
+
+# Suggested venues per artist and suggested artists per venue kept by the
+# rescore_matches batch job (match_scores.py)
+MATCH_LIMIT = 20
+
+# Per request SQL and template timings, sent as a Server-Timing header and
+# aggregated per endpoint on /metrics
+METRICS_ENABLED = True
+
+# Database of the async read path (asgi.py), derived from
+# SQLALCHEMY_DATABASE_URI with the asyncpg driver when unset
+ASYNC_DATABASE_URI = None
+
+# Fingerprinted static assets built by build_assets.py (see assets.py),
+# <app>/assets when unset
+ASSETS_DIR = None
@@ -0,0 +1,24 @@
+import click
+
+from app import app
+from bulk import export_chunks, EXPORT_KINDS, EXPORT_FORMATS
+
+# Dumps the artists, venues or shows like GET /api/v1/export/<kind> (see the
+# Export section of bulk.py), to a file or stdout:
+#   FLASK_APP=data_export.py flask export_data shows --format csv --gzip --out shows.csv.gz
+
+@app.cli.command('export_data')
+@click.argument('kind', type=click.Choice(EXPORT_KINDS))
+@click.option('--format', 'format', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--from', 'start_time', type=click.DateTime(), help='Shows starting at or after this time.')
+@click.option('--to', 'end_time', type=click.DateTime(), help='Shows starting before this time.')
+@click.option('--out', type=click.File('wb'), default='-', show_default=True)
+def export_data(kind, format, compress, start_time, end_time, out):
+    if kind != 'shows' and (start_time or end_time):
+        raise click.BadParameter('Only shows can be exported by start time', param_hint='--from/--to')
+    for chunk in export_chunks(kind, format, compress, start_time, end_time):
+        out.write(chunk)
+
+if __name__ == '__main__':
+    app.cli()
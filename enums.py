@@ -25,6 +25,17 @@ class Genre(Enum):
     def choices(cls):
         return [ (choice.value, choice.value) for choice in cls ]
 
+    @classmethod
+    def normalize(cls, values):
+        # Unknown genres are stored as Other, duplicates are dropped
+        known = [ choice.value for choice in cls ]
+        genres = []
+        for value in values:
+            genre = value if value in known else cls.Other.value
+            if genre not in genres:
+                genres.append(genre)
+        return genres
+
 class State(Enum):
     AL = 'AL'
     AK = 'AK'
@@ -0,0 +1,28 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+from flask_moment import Moment
+from flask_marshmallow import Marshmallow
+from flask_wtf.csrf import CsrfProtect
+from cache import PageCache, FragmentCache
+from metrics import RequestMetrics
+from routing import RoutingSQLAlchemy
+from assets import Assets
+from autocomplete import Autocomplete
+
+#----------------------------------------------------------------------------#
+# Extensions.
+#----------------------------------------------------------------------------#
+
+# Created unbound so models, schemas and views can import them, and bound to
+# the app by create_app() in app.py
+
+moment = Moment()
+db = RoutingSQLAlchemy()
+ma = Marshmallow()
+csrf = CsrfProtect()
+page_cache = PageCache()
+fragment_cache = FragmentCache(page_cache)
+request_metrics = RequestMetrics()
+assets = Assets()
+autocomplete = Autocomplete()
@@ -7,7 +7,7 @@ from fabric.contrib.console import confirm
 def test():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python benchmark.py benchmark && python query_plans.py", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -40,7 +40,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run python query_plans.py"
     )
 
 
@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, Regexp, Length, Optional
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, InputRequired, AnyOf, URL, ValidationError, Regexp, Length, Optional, NumberRange
 from enums import Genre, State
 
 def anyof_for_multiple_field(values):
@@ -15,18 +15,31 @@ def anyof_for_multiple_field(values):
             raise ValidationError(message)
     return _validate
 
+# Show length in minutes. Conflict checks only look this far back for shows
+# overlapping a new one, so longer shows are refused.
+DEFAULT_SHOW_DURATION_MINUTES = 120
+MAX_SHOW_DURATION_MINUTES = 12 * 60
+
 class ShowForm(Form):
-    artist_id = StringField(
-        'artist_id'
+    # Also validates the rows of bulk imports, which may leave fields out
+    artist_id = IntegerField(
+        'artist_id',
+        validators=[InputRequired()]
     )
-    venue_id = StringField(
-        'venue_id'
+    venue_id = IntegerField(
+        'venue_id',
+        validators=[InputRequired()]
     )
     start_time = DateTimeField(
         'start_time',
-        validators=[DataRequired()],
+        validators=[InputRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_DURATION_MINUTES)],
+        default=DEFAULT_SHOW_DURATION_MINUTES
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,126 @@
+import os
+import csv
+import math
+from functools import lru_cache
+
+# Venue locations. Venues get the coordinates of the centroid of their city,
+# read from db/city_centroids.csv (city, state, latitude, longitude; more
+# rows can be appended, e.g. from the Census Gazetteer), and the geohash of
+# those coordinates.
+#
+# A geohash names the cell of a grid halving longitude and latitude in turn,
+# five halvings per character, so every prefix of a geohash is the larger
+# cell holding it and the venues of a cell are one range of a B-tree index on
+# the column. A circle is covered by a handful of cells of the largest
+# precision keeping them few, each read as a range scan, and the candidates
+# are then filtered and sorted by their exact distance.
+
+CITY_CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'city_centroids.csv')
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Characters of the stored geohashes, cells of about 5 x 5 meters
+GEOHASH_PRECISION = 9
+
+# Cells covering a circle at most, the fewer the larger (and the more
+# candidates outside the circle they hold)
+MAX_COVERING_CELLS = 16
+
+# Radius of /venues/nearby, by default and at most
+DEFAULT_RADIUS_MILES = 25
+MAX_RADIUS_MILES = 500
+
+# Radius of the first circle searched for the nearest venues, see
+# models.nearby_venues()
+FIRST_RADIUS_MILES = 1
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LATITUDE = 69.05
+
+@lru_cache(maxsize=None)
+def city_centroids(path=CITY_CENTROIDS_PATH):
+    with open(path, newline='') as centroids_file:
+        return {
+            (row['city'].strip().casefold(), row['state'].strip().upper()): (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(centroids_file)
+        }
+
+def city_centroid(city, state):
+    # (latitude, longitude) of the city, None when it is not in the table
+    if not city or not state:
+        return None
+    return city_centroids().get((city.strip().casefold(), state.strip().upper()))
+
+def geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitudes = [-90.0, 90.0]
+    longitudes = [-180.0, 180.0]
+    characters = []
+    value = bits = 0
+    even = True
+    while len(characters) < precision:
+        # Longitude on even bits, latitude on odd bits
+        bounds, coordinate = (longitudes, longitude) if even else (latitudes, latitude)
+        middle = (bounds[0] + bounds[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            bounds[0] = middle
+        else:
+            value = value * 2
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            characters.append(BASE32[value])
+            value = bits = 0
+    return ''.join(characters)
+
+def cell_size(precision):
+    # (degrees of latitude, degrees of longitude) of the cells of precision
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+def next_cell(cell):
+    # The first geohash after every geohash of cell, None for the last cell
+    for position in range(len(cell) - 1, -1, -1):
+        index = BASE32.index(cell[position])
+        if index < len(BASE32) - 1:
+            return cell[:position] + BASE32[index + 1]
+    return None
+
+def bounding_box(latitude, longitude, radius):
+    # (south, west, north, east) of a circle of radius miles. Circles are
+    # clipped at the poles and at the antimeridian.
+    latitude_delta = radius / MILES_PER_DEGREE_LATITUDE
+    south = max(latitude - latitude_delta, -90.0)
+    north = min(latitude + latitude_delta, 90.0)
+    widest = max(abs(south), abs(north))
+    if widest >= 89.9:
+        return south, -180.0, north, 180.0
+    longitude_delta = latitude_delta / math.cos(math.radians(widest))
+    return south, max(longitude - longitude_delta, -180.0), north, min(longitude + longitude_delta, 180.0)
+
+def covering_cells(latitude, longitude, radius, max_cells=MAX_COVERING_CELLS):
+    # Sorted geohash cells covering the circle, of the largest precision
+    # covering it with max_cells cells at most
+    south, west, north, east = bounding_box(latitude, longitude, radius)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(int((south + 90) // height), int(min(north + 90, 180 - height / 2) // height) + 1)
+        columns = range(int((west + 180) // width), int(min(east + 180, 360 - width / 2) // width) + 1)
+        if len(rows) * len(columns) <= max_cells or precision == 1:
+            break
+    return sorted({
+        geohash((row + 0.5) * height - 90, (column + 0.5) * width - 180, precision)
+        for row in rows for column in columns
+    })
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+    # Great-circle distance in miles (haversine)
+    latitude, longitude, other_latitude, other_longitude = map(
+        math.radians, (latitude, longitude, other_latitude, other_longitude)
+    )
+    a = (
+        math.sin((other_latitude - latitude) / 2) ** 2
+        + math.cos(latitude) * math.cos(other_latitude) * math.sin((other_longitude - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
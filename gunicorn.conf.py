@@ -0,0 +1,26 @@
+import os
+import multiprocessing
+
+# Production server:
+#   SECRET_KEY=... gunicorn app:app -c gunicorn.conf.py
+#
+# The master imports app.py once and forks the workers from it, so they
+# start without importing anything and share the loaded code. Each worker
+# gets its own database connections, see routing.py.
+
+# Read pages are cached on the filesystem, shared by the workers, so a write
+# handled by one worker evicts the pages of every other (see config.py).
+# Read here, in the master, before the app is imported.
+os.environ.setdefault('CACHE_TYPE', 'filesystem')
+
+bind = '0.0.0.0:' + os.environ.get('PORT', '5000')
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+def when_ready(server):
+    # Builds the autocomplete index in the master, before the workers are
+    # forked, so they start with it
+    from app import app
+    from extensions import autocomplete
+    with app.app_context():
+        autocomplete.load()
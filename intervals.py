@@ -0,0 +1,89 @@
+import random
+
+# In-memory interval tree, for checking many intervals against each other
+# without a database round trip per interval (e.g. validating a batch of
+# shows before it is inserted).
+#
+# Intervals are half-open, [start, end): one ending when the next starts does
+# not overlap it. The tree is a treap ordered by start where every node also
+# holds the largest end of its subtree, so a query skips the subtrees ending
+# before the queried interval and the ones starting after it. Adding and
+# querying take O(log n) expected time, plus the number of intervals found.
+
+class Node:
+    __slots__ = ('start', 'end', 'value', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, start, end, value):
+        self.start = start
+        self.end = end
+        self.value = value
+        self.priority = random.random()
+        self.max_end = end
+        self.left = None
+        self.right = None
+
+def update(node):
+    node.max_end = node.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+def rotate_right(node):
+    left = node.left
+    node.left = left.right
+    left.right = node
+    update(node)
+    update(left)
+    return left
+
+def rotate_left(node):
+    right = node.right
+    node.right = right.left
+    right.left = node
+    update(node)
+    update(right)
+    return right
+
+def insert(node, new):
+    if node is None:
+        return new
+    if new.start < node.start:
+        node.left = insert(node.left, new)
+        if node.left.priority > node.priority:
+            return rotate_right(node)
+    else:
+        node.right = insert(node.right, new)
+        if node.right.priority > node.priority:
+            return rotate_left(node)
+    update(node)
+    return node
+
+def collect(node, start, end, found):
+    # Values of the intervals overlapping [start, end), in start order
+    if node is None or node.max_end <= start:
+        return
+    collect(node.left, start, end, found)
+    if node.start < end:
+        if node.end > start:
+            found.append(node.value)
+        collect(node.right, start, end, found)
+
+class IntervalTree:
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, start, end, value=None):
+        if not start < end:
+            raise ValueError(f'Empty interval [{start}, {end})')
+        self.root = insert(self.root, Node(start, end, value))
+        self.size += 1
+
+    def overlapping(self, start, end):
+        found = []
+        collect(self.root, start, end, found)
+        return found
@@ -0,0 +1,60 @@
+import sys
+import time
+import click
+
+from app import app
+from extensions import db, page_cache
+from models import Artist, Venue, Match, match_profiles, past_show_pairs
+from matchmaking import Profiles, history, rescore, CHUNK_SIZE
+
+# Rescores every artist against every venue (see matchmaking.py) and replaces
+# the suggestions stored in Match, served by /artists/<id>/suggested-venues
+# and /venues/<id>/suggested-artists. Schedule it, e.g. nightly with cron or
+# the Heroku scheduler; artists and venues created or edited since the last
+# run get their suggestions from the next one.
+#   FLASK_APP=match_scores.py flask rescore_matches
+
+INSERT_BATCH_SIZE = 10000
+
+@app.cli.command('rescore_matches')
+@click.option('--limit', type=int, help='Suggestions kept per artist and per venue [default: MATCH_LIMIT]')
+@click.option('--chunk-size', default=CHUNK_SIZE, show_default=True, help='Artists scored per block')
+def rescore_matches(limit, chunk_size):
+    limit = limit or app.config.get('MATCH_LIMIT', 20)
+    started = time.time()
+    places = {}
+    artists = Profiles.build(*match_profiles(Artist), places)
+    venues = Profiles.build(*match_profiles(Venue), places)
+    past = history(artists, venues, past_show_pairs())
+    artist_ids, venue_ids, scores, artist_ranks, venue_ranks = rescore(artists, venues, past, limit, chunk_size)
+    scored = time.time()
+
+    try:
+        # Replaced in one transaction, the suggestions are never read half
+        # written
+        Match.query.delete()
+        for start in range(0, len(scores), INSERT_BATCH_SIZE):
+            batch = slice(start, start + INSERT_BATCH_SIZE)
+            db.session.execute(Match.__table__.insert(), [
+                {'artist_id': artist_id, 'venue_id': venue_id, 'score': round(score, 4),
+                 'artist_rank': artist_rank or None, 'venue_rank': venue_rank or None}
+                for artist_id, venue_id, score, artist_rank, venue_rank in zip(
+                    artist_ids[batch].tolist(), venue_ids[batch].tolist(), scores[batch].tolist(),
+                    artist_ranks[batch].tolist(), venue_ranks[batch].tolist()
+                )
+            ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        print(sys.exc_info())
+        raise click.ClickException('Matches not stored, the previous suggestions are kept')
+    finally:
+        db.session.close()
+    page_cache.invalidate_from_cli('matches')
+    click.echo(
+        f'Scored {len(artists)} artists x {len(venues)} venues in {scored - started:.1f}s, '
+        f'stored {len(scores)} matches in {time.time() - scored:.1f}s'
+    )
+
+if __name__ == '__main__':
+    app.cli()
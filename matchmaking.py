@@ -0,0 +1,207 @@
+import numpy as np
+
+from enums import Genre
+
+# Artist and venue matchmaking. Every (artist, venue) pair is scored from:
+# - the overlap of their genres, |shared| / sqrt(|artist's| x |venue's|), the
+#   cosine of their genre vectors,
+# - their seeking flags, each side seeking a partner adds to the score,
+# - their places, the same state and further the same city,
+# - their history, the past shows of the artist at the venue.
+# Pairs sharing no genre and no past show are not matches, score 0.
+#
+# Artists and venues are held as NumPy arrays (Profiles), their genres as
+# bitmasks of the Genre enum unpacked to 0/1 rows of unit length, so the
+# genre overlaps of a block of artists against every venue are one matrix
+# product and each other term one broadcast operation. rescore() scores every
+# artist against every venue a block of artists at a time, keeping the best
+# venues of each artist and the best artists of each venue, for the batch job
+# of match_scores.py.
+
+# Bit of each genre in the masks, in the order of the enum
+GENRE_BITS = {genre.value: 1 << position for position, genre in enumerate(Genre)}
+GENRE_SHIFTS = np.arange(len(Genre), dtype=np.uint32)
+
+# Weights of the score terms, a perfect match scores 1
+GENRE_WEIGHT = 0.5
+SEEKING_WEIGHT = 0.1
+STATE_WEIGHT = 0.1
+CITY_WEIGHT = 0.1
+HISTORY_WEIGHT = 0.1
+# Past shows together earning the whole history weight
+HISTORY_SHOWS = 3
+
+# Artists scored per block, a block holds CHUNK_SIZE x venues scores
+CHUNK_SIZE = 256
+# Groups of columns whose maxima bound the best scores of a row, see best()
+SELECT_GROUPS = 256
+
+def place_codes(places, city, state):
+    # (state code, city code) of a place, -1 when unknown. places maps the
+    # normalized states and (city, state) pairs to their codes, shared by the
+    # artists and the venues compared.
+    if not state:
+        return -1, -1
+    state = state.strip().upper()
+    state_code = places.setdefault(state, len(places))
+    if not city:
+        return state_code, -1
+    return state_code, places.setdefault((city.strip().casefold(), state), len(places))
+
+def positions(ids, wanted):
+    # Positions of wanted in the sorted ids, -1 for the ones missing
+    wanted = np.asarray(wanted, dtype=np.int64)
+    if not len(ids):
+        return np.full(len(wanted), -1, dtype=np.int64)
+    found = np.minimum(np.searchsorted(ids, wanted), len(ids) - 1)
+    return np.where(ids[found] == wanted, found, -1)
+
+class Profiles:
+    # Artists or venues, one entry per id, sorted by id
+    def __init__(self, ids, masks, seeking, states, cities):
+        self.ids = ids
+        self.masks = masks
+        self.seeking = seeking
+        self.states = states
+        self.cities = cities
+        genres = ((masks[:, None] >> GENRE_SHIFTS) & 1).astype(np.float32)
+        self.genres = genres / np.sqrt(np.maximum(genres.sum(axis=1, keepdims=True), 1))
+
+    @classmethod
+    def build(cls, rows, genre_rows, places):
+        # rows are (id, seeking, city, state) tuples sorted by id, genre_rows
+        # (id, genre) tuples
+        ids, seeking, states, cities = [], [], [], []
+        for id, is_seeking, city, state in rows:
+            state_code, city_code = place_codes(places, city, state)
+            ids.append(id)
+            seeking.append(bool(is_seeking))
+            states.append(state_code)
+            cities.append(city_code)
+        ids = np.array(ids, dtype=np.int64)
+        genre_ids, bits = [], []
+        for id, genre in genre_rows:
+            genre_ids.append(id)
+            bits.append(GENRE_BITS[genre])
+        # Genres of ids missing from rows, e.g. written since they were read,
+        # are left out
+        genre_positions = positions(ids, genre_ids)
+        known = genre_positions >= 0
+        masks = np.zeros(len(ids), dtype=np.uint32)
+        np.bitwise_or.at(masks, genre_positions[known], np.array(bits, dtype=np.uint32)[known])
+        return cls(
+            ids, masks, np.array(seeking, dtype=bool),
+            np.array(states, dtype=np.int32), np.array(cities, dtype=np.int32)
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        return Profiles(self.ids[key], self.masks[key], self.seeking[key], self.states[key], self.cities[key])
+
+    def positions(self, ids):
+        return positions(self.ids, ids)
+
+def history(artists, venues, pairs):
+    # (artist positions, venue positions, past shows) arrays of the
+    # (artist id, venue id, past shows) pairs, sorted by artist position
+    pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 3)
+    rows = artists.positions(pairs[:, 0])
+    columns = venues.positions(pairs[:, 1])
+    known = (rows >= 0) & (columns >= 0)
+    order = np.argsort(rows[known], kind='stable')
+    return rows[known][order], columns[known][order], pairs[known, 2][order]
+
+def score(artists, venues, past=None):
+    # Scores of every (artist, venue) pair, an artists x venues float32
+    # matrix. past holds the history() of these artists and venues. Computed
+    # in place, one pass over the matrix per term.
+    scores = (np.float32(GENRE_WEIGHT) * artists.genres) @ venues.genres.T
+    matched = scores > 0
+    scores += (SEEKING_WEIGHT * artists.seeking).astype(np.float32)[:, None]
+    scores += (SEEKING_WEIGHT * venues.seeking).astype(np.float32)[None, :]
+    same_place = np.equal.outer(artists.states, venues.states)
+    same_place[artists.states < 0] = False
+    scores += np.float32(STATE_WEIGHT) * same_place
+    np.equal(artists.cities[:, None], venues.cities[None, :], out=same_place)
+    same_place[artists.cities < 0] = False
+    scores += np.float32(CITY_WEIGHT) * same_place
+    if past is not None:
+        rows, columns, shows = past
+        scores[rows, columns] += HISTORY_WEIGHT * np.minimum(shows, HISTORY_SHOWS).astype(np.float32) / HISTORY_SHOWS
+        matched[rows, columns] = True
+    scores *= matched
+    return scores
+
+def best(scores, limit):
+    # (positions, scores) of the limit best positive columns of each row, best
+    # first, ties to the first column, padded with position -1 and score 0.
+    # The limit-th largest of the maxima of limit groups of columns or more is
+    # at most the limit-th largest score, only the columns reaching it are
+    # sorted.
+    count, columns = scores.shape
+    limit = min(limit, columns)
+    groups = np.linspace(0, columns, min(columns, max(limit, SELECT_GROUPS)), endpoint=False).astype(np.int64)
+    threshold = np.partition(np.maximum.reduceat(scores, groups, axis=1), -limit, axis=1)[:, -limit]
+    rows, positions = np.nonzero(scores >= np.maximum(threshold, np.finfo(np.float32).tiny)[:, None])
+    values = scores[rows, positions]
+    order = np.lexsort((positions, -values, rows))
+    found = np.bincount(rows, minlength=count)
+    ranks = np.arange(limit)
+    valid = ranks < np.minimum(found, limit)[:, None]
+    if not len(order):
+        return np.full((count, limit), -1, dtype=np.int64), np.zeros((count, limit), dtype=scores.dtype)
+    selected = order[np.where(valid, (np.cumsum(found) - found)[:, None] + ranks, 0)]
+    return np.where(valid, positions[selected], -1), np.where(valid, values[selected], 0)
+
+def rescore(artists, venues, past, limit, chunk_size=CHUNK_SIZE):
+    # Scores every artist against every venue, chunk_size artists at a time.
+    # Returns the (artist ids, venue ids, scores, artist ranks, venue ranks)
+    # arrays of the pairs among the limit best venues of their artist or the
+    # limit best artists of their venue. Ranks start at 1, 0 when the pair is
+    # not among the best of that side.
+    if not len(artists) or not len(venues):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float32), empty, empty
+    rows, columns, shows = past
+    artist_pairs = []
+    # Best artists of each venue so far, best first, a venues x limit block
+    # of artist positions (-1 while fewer) and their scores
+    venue_limit = min(limit, len(artists))
+    venue_best = np.full((len(venues), venue_limit), -1, dtype=np.int64)
+    venue_scores = np.zeros((len(venues), venue_limit), dtype=np.float32)
+    for start in range(0, len(artists), chunk_size):
+        end = min(start + chunk_size, len(artists))
+        first, last = np.searchsorted(rows, [start, end])
+        scores = score(artists[start:end], venues, (rows[first:last] - start, columns[first:last], shows[first:last]))
+
+        positions, best_scores = best(scores, limit)
+        chunk_rows = np.broadcast_to(np.arange(start, end)[:, None], positions.shape)
+        ranks = np.broadcast_to(np.arange(1, positions.shape[1] + 1), positions.shape)
+        kept = best_scores > 0
+        artist_pairs.append((chunk_rows[kept], positions[kept], best_scores[kept], ranks[kept]))
+
+        # Only the venues scoring an artist of the block above their worst
+        # best artist are merged, few once the first blocks are scored
+        improved = np.flatnonzero((scores > venue_scores[:, -1]).any(axis=0))
+        if len(improved):
+            candidates = np.hstack([venue_best[improved], np.broadcast_to(np.arange(start, end), (len(improved), end - start))])
+            positions, venue_scores[improved] = best(np.hstack([venue_scores[improved], scores[:, improved].T]), venue_limit)
+            venue_best[improved] = np.take_along_axis(candidates, positions, axis=1)
+
+    artist_rows, artist_columns, artist_scores, artist_ranks = (np.concatenate(parts) for parts in zip(*artist_pairs))
+    kept = venue_scores > 0
+    venue_rows = venue_best[kept]
+    venue_columns = np.broadcast_to(np.arange(len(venues))[:, None], venue_best.shape)[kept]
+    venue_ranks = np.broadcast_to(np.arange(1, venue_best.shape[1] + 1), venue_best.shape)[kept]
+
+    # Pairs among the best of both sides are kept once
+    keys = np.concatenate([artist_rows * len(venues) + artist_columns, venue_rows * len(venues) + venue_columns])
+    pairs, inverse = np.unique(keys, return_inverse=True)
+    scores = np.zeros(len(pairs), dtype=np.float32)
+    scores[inverse] = np.concatenate([artist_scores, venue_scores[kept]])
+    ranks = np.zeros((2, len(pairs)), dtype=np.int64)
+    ranks[0, inverse[:len(artist_rows)]] = artist_ranks
+    ranks[1, inverse[len(artist_rows):]] = venue_ranks
+    return artists.ids[pairs // len(venues)], venues.ids[pairs % len(venues)], scores, ranks[0], ranks[1]
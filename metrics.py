@@ -0,0 +1,136 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+from flask import g, request, has_app_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Histograms.
+#----------------------------------------------------------------------------#
+
+# Aggregates are kept per process: with several workers each one exposes its
+# own series, which Prometheus sums per instance.
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        # labels is a tuple of (name, value) pairs. Callers hold the lock.
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return lines
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#----------------------------------------------------------------------------#
+
+# Per request, SQL statements and their time are recorded from the engine
+# events of every engine, and template render time from Flask's template
+# signals. Each request gets a Server-Timing header
+#   Server-Timing: db;dur=4.1;desc="3 queries", tpl;dur=2.0, app;dur=9.7
+# and its figures are added to the per endpoint histograms served by render()
+# in the Prometheus text format. Recording is a few counter updates per
+# statement and per request.
+
+class RequestMetrics:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            'fyyur_request_duration_seconds', 'Time spent handling the request.', DURATION_BUCKETS)
+        self.db_duration = Histogram(
+            'fyyur_db_duration_seconds', 'Time spent executing SQL statements per request.', DURATION_BUCKETS)
+        self.db_statements = Histogram(
+            'fyyur_db_statements', 'SQL statements executed per request.', STATEMENT_BUCKETS)
+        self.template_duration = Histogram(
+            'fyyur_template_duration_seconds', 'Time spent rendering templates per request.', DURATION_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        before_render_template.connect(before_render, app)
+        template_rendered.connect(after_render, app)
+        app.before_request(start_request)
+        app.after_request(self.finish_request)
+
+    def finish_request(self, response):
+        recorded = g.get('request_metrics')
+        if recorded is None:
+            return response
+        elapsed = perf_counter() - recorded['started']
+        response.headers.add(
+            'Server-Timing',
+            f"db;dur={recorded['db'] * 1000:.1f};desc=\"{recorded['statements']} queries\", "
+            f"tpl;dur={recorded['template'] * 1000:.1f}, app;dur={elapsed * 1000:.1f}"
+        )
+        labels = (('endpoint', request.endpoint or 'none'), ('method', request.method))
+        with self._lock:
+            self.request_duration.observe(labels, elapsed)
+            self.db_duration.observe(labels, recorded['db'])
+            self.db_statements.observe(labels, recorded['statements'])
+            self.template_duration.observe(labels, recorded['template'])
+        return response
+
+    def render(self):
+        with self._lock:
+            histograms = (self.request_duration, self.db_duration, self.db_statements, self.template_duration)
+            lines = [line for histogram in histograms for line in histogram.render()]
+        return '\n'.join(lines) + '\n'
+
+def start_request():
+    g.request_metrics = {'started': perf_counter(), 'statements': 0, 'db': 0.0, 'template': 0.0, 'rendering': []}
+
+def current_metrics():
+    if not has_app_context():
+        return None
+    return g.get('request_metrics')
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_started'] = perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorded = current_metrics()
+    if recorded is not None:
+        recorded['statements'] += 1
+        recorded['db'] += perf_counter() - conn.info['statement_started']
+
+def before_render(sender, template, context, **extra):
+    recorded = current_metrics()
+    if recorded is not None:
+        recorded['rendering'].append(perf_counter())
+
+def after_render(sender, template, context, **extra):
+    recorded = current_metrics()
+    if recorded is not None and recorded['rendering']:
+        started = recorded['rendering'].pop()
+        # Only the outermost template counts, nested renders are part of it
+        if not recorded['rendering']:
+            recorded['template'] += perf_counter() - started
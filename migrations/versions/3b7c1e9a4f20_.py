@@ -0,0 +1,101 @@
+"""normalize artist and venue genres
+
+Revision ID: 3b7c1e9a4f20
+Revises: 9855bc1b119d
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c1e9a4f20'
+down_revision = '9855bc1b119d'
+branch_labels = None
+depends_on = None
+
+# Snapshot of enums.Genre at the time of this revision
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+genre = sa.Enum(*GENRES, name='genre')
+
+
+def split_genres(value):
+    # Comma-joined genres to a list of known genres, unknown ones become Other
+    genres = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        item = item if item in GENRES else 'Other'
+        if item not in genres:
+            genres.append(item)
+    return genres
+
+
+def upgrade():
+    artist_genre = op.create_table('ArtistGenre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre', genre, nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre')
+    )
+    op.create_index('ix_ArtistGenre_genre_artist_id', 'ArtistGenre', ['genre', 'artist_id'], unique=False)
+    venue_genre = op.create_table('VenueGenre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre', genre, nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre')
+    )
+    op.create_index('ix_VenueGenre_genre_venue_id', 'VenueGenre', ['genre', 'venue_id'], unique=False)
+
+    # Backfill the association tables from the comma-joined columns
+    connection = op.get_bind()
+    artists = connection.execute(sa.text('SELECT id, genres FROM "Artist"')).fetchall()
+    rows = [
+        {'artist_id': artist_id, 'genre': item}
+        for artist_id, genres in artists for item in split_genres(genres)
+    ]
+    if rows:
+        op.bulk_insert(artist_genre, rows)
+    venues = connection.execute(sa.text('SELECT id, genres FROM "Venue"')).fetchall()
+    rows = [
+        {'venue_id': venue_id, 'genre': item}
+        for venue_id, genres in venues for item in split_genres(genres)
+    ]
+    if rows:
+        op.bulk_insert(venue_genre, rows)
+
+    op.drop_column('Artist', 'genres')
+    op.drop_column('Venue', 'genres')
+
+
+def downgrade():
+    op.add_column('Venue', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('Artist', sa.Column('genres', sa.String(length=120), nullable=True))
+
+    connection = op.get_bind()
+    for table, key, link_table in (('Artist', 'artist_id', 'ArtistGenre'), ('Venue', 'venue_id', 'VenueGenre')):
+        links = connection.execute(sa.text(
+            'SELECT {key}, genre FROM "{link_table}" ORDER BY {key}'.format(key=key, link_table=link_table)
+        )).fetchall()
+        genres = {}
+        for owner_id, item in links:
+            genres.setdefault(owner_id, []).append(item)
+        for owner_id, items in genres.items():
+            connection.execute(
+                sa.text('UPDATE "{table}" SET genres = :genres WHERE id = :id'.format(table=table)),
+                {'genres': ','.join(items), 'id': owner_id}
+            )
+
+    op.drop_index('ix_VenueGenre_genre_venue_id', table_name='VenueGenre')
+    op.drop_table('VenueGenre')
+    op.drop_index('ix_ArtistGenre_genre_artist_id', table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    genre.drop(op.get_bind(), checkfirst=True)
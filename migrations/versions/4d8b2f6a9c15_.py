@@ -0,0 +1,40 @@
+"""artist and venue matches
+
+Revision ID: 4d8b2f6a9c15
+Revises: 7a4c2d9e1f63
+Create Date: 2026-10-18 18:02:37.514392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8b2f6a9c15'
+down_revision = '7a4c2d9e1f63'
+branch_labels = None
+depends_on = None
+
+# Filled by the batch job:
+#   FLASK_APP=match_scores.py flask rescore_matches
+
+
+def upgrade():
+    op.create_table('Match',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('artist_rank', sa.Integer(), nullable=True),
+    sa.Column('venue_rank', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'venue_id')
+    )
+    op.create_index('ix_Match_artist_id_artist_rank', 'Match', ['artist_id', 'artist_rank'], unique=False)
+    op.create_index('ix_Match_venue_id_venue_rank', 'Match', ['venue_id', 'venue_rank'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Match_venue_id_venue_rank', table_name='Match')
+    op.drop_index('ix_Match_artist_id_artist_rank', table_name='Match')
+    op.drop_table('Match')
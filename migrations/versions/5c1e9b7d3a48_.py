@@ -0,0 +1,60 @@
+"""show end times and booking exclusion constraints
+
+Revision ID: 5c1e9b7d3a48
+Revises: 2f6a9c4e7b31
+Create Date: 2026-10-18 14:37:12.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e9b7d3a48'
+down_revision = '2f6a9c4e7b31'
+branch_labels = None
+depends_on = None
+
+# Stored shows get the default duration of forms.DEFAULT_SHOW_DURATION_MINUTES.
+# SQLite datetimes are compared as text, in SQLAlchemy's format.
+DEFAULT_END_TIME = {
+    'postgresql': "start_time + interval '120 minutes'",
+    'sqlite': "datetime(start_time, '+120 minutes') || '.000000'",
+}
+
+
+def upgrade():
+    connection = op.get_bind()
+    dialect = connection.dialect.name
+
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.add_column('ShowFeed', sa.Column('end_time', sa.DateTime(), nullable=True))
+    connection.execute(sa.text(f'UPDATE "Show" SET end_time = {DEFAULT_END_TIME[dialect]}'))
+    connection.execute(sa.text(
+        'UPDATE "ShowFeed" SET end_time = (SELECT end_time FROM "Show" WHERE "Show".id = "ShowFeed".show_id)'
+    ))
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('Show_end_time_after_start_time', 'end_time > start_time')
+    with op.batch_alter_table('ShowFeed') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+
+    if dialect == 'postgresql':
+        # Fails if stored shows of an artist or a venue already overlap
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for key in ('artist_id', 'venue_id'):
+            op.execute(
+                f'ALTER TABLE "Show" ADD CONSTRAINT "Show_{key}_overlap_excl" '
+                f'EXCLUDE USING gist ({key} WITH =, tsrange(start_time, end_time) WITH &&)'
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for key in ('venue_id', 'artist_id'):
+            op.drop_constraint(f'Show_{key}_overlap_excl', 'Show')
+    with op.batch_alter_table('ShowFeed') as batch_op:
+        batch_op.drop_column('end_time')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_constraint('Show_end_time_after_start_time', type_='check')
+        batch_op.drop_column('end_time')
@@ -0,0 +1,34 @@
+"""venue coordinates and geohash
+
+Revision ID: 7a4c2d9e1f63
+Revises: 5c1e9b7d3a48
+Create Date: 2026-10-18 16:21:45.730118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c2d9e1f63'
+down_revision = '5c1e9b7d3a48'
+branch_labels = None
+depends_on = None
+
+# Stored venues are located afterwards from the city centroid table:
+#   FLASK_APP=venue_locations.py flask locate_venues
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.create_index('ix_Venue_geohash', 'Venue', ['geohash', 'latitude', 'longitude', 'upcoming_shows_count'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_geohash', table_name='Venue')
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,60 @@
+"""search indexes for artists and venues
+
+Revision ID: a41d7f0c2b95
+Revises: 3b7c1e9a4f20
+Create Date: 2026-10-18 11:02:47.915306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d7f0c2b95'
+down_revision = '3b7c1e9a4f20'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Artist', 'Venue')
+
+
+def fts_statements(name):
+    fts = f'{name}Search'
+    return [
+        f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+        f'name, city, content="{name}", content_rowid="id", tokenize="trigram")',
+        f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, name, city) VALUES (new.id, new.name, new.city); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name, city) VALUES (\'delete\', old.id, old.name, old.city); END',
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name, city) VALUES (\'delete\', old.id, old.name, old.city); '
+        f'INSERT INTO "{fts}"(rowid, name, city) VALUES (new.id, new.name, new.city); END',
+    ]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name in TABLES:
+        if dialect == 'sqlite':
+            for statement in fts_statements(name):
+                op.execute(statement)
+        for column in ('name', 'city'):
+            op.create_index(
+                f'ix_{name}_{column}_trgm', name, [column], unique=False,
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for name in TABLES:
+        for column in ('name', 'city'):
+            op.drop_index(f'ix_{name}_{column}_trgm', table_name=name)
+        if dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS "{name}Search_{suffix}"')
+            op.execute(f'DROP TABLE IF EXISTS "{name}Search"')
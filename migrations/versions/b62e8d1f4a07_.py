@@ -0,0 +1,46 @@
+"""search triggers on name and city updates only
+
+Revision ID: b62e8d1f4a07
+Revises: 4d8b2f6a9c15
+Create Date: 2026-10-18 21:14:05.382716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b62e8d1f4a07'
+down_revision = '4d8b2f6a9c15'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Artist', 'Venue')
+
+# The SQLite FTS tables only index name and city, updates of the other
+# columns (e.g. the show counters) no longer rewrite their entries
+
+
+def au_trigger(name, columns):
+    fts = f'{name}Search'
+    return (
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE{columns} ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name, city) VALUES (\'delete\', old.id, old.name, old.city); '
+        f'INSERT INTO "{fts}"(rowid, name, city) VALUES (new.id, new.name, new.city); END'
+    )
+
+
+def replace_triggers(columns):
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for name in TABLES:
+        op.execute(f'DROP TRIGGER IF EXISTS "{name}Search_au"')
+        op.execute(au_trigger(name, columns))
+
+
+def upgrade():
+    replace_triggers(' OF name, city')
+
+
+def downgrade():
+    replace_triggers('')
@@ -0,0 +1,656 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import functools
+from sqlalchemy import event, DDL, table, column, literal
+from sqlalchemy.ext.associationproxy import association_proxy
+from extensions import db
+from enums import Genre
+from forms import DEFAULT_SHOW_DURATION_MINUTES, MAX_SHOW_DURATION_MINUTES
+from intervals import IntervalTree
+from geo import city_centroid, geohash, bounding_box, covering_cells, next_cell, distance, FIRST_RADIUS_MILES
+
+from datetime import datetime, timedelta
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+# Genres are stored one row per (artist|venue, genre) and keyed to the Genre enum
+genre_type = db.Enum(*[genre.value for genre in Genre], name='genre')
+
+class ArtistGenre(db.Model):
+    __tablename__ = 'ArtistGenre'
+    __table_args__ = (
+        db.Index('ix_ArtistGenre_genre_artist_id', 'genre', 'artist_id'),
+    )
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(genre_type, primary_key=True)
+
+class VenueGenre(db.Model):
+    __tablename__ = 'VenueGenre'
+    __table_args__ = (
+        db.Index('ix_VenueGenre_genre_venue_id', 'genre', 'venue_id'),
+    )
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(genre_type, primary_key=True)
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        # Trigram GIN indexes back the ILIKE '%term%' search on Postgres
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        # Keyset pagination of /artists
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genre_links = db.relationship('ArtistGenre', cascade='all, delete-orphan', order_by='ArtistGenre.genre')
+    genres = association_proxy('genre_links', 'genre', creator=lambda genre: ArtistGenre(genre=genre))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean())
+    seeking_description = db.Column(db.String(120))
+    # Maintained counters, see the Show counters section
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+      return f'<Artist: {self.name}>'
+    
+    @classmethod
+    def get_with_shows_or_404(cls, artist_id):
+      # The artist, all its shows and their venues in a single joined query
+      return cls.query.options(
+          db.joinedload(cls.shows).joinedload(Show.venue),
+          db.selectinload(cls.genre_links)
+      ).filter(cls.id == artist_id).first_or_404()
+
+def default_end_time(context):
+    return context.get_current_parameters()['start_time'] + timedelta(minutes=DEFAULT_SHOW_DURATION_MINUTES)
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        # Keyset pagination of /shows, also serves the start_time range filters
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # Shows of a venue or an artist in a start_time window, sorted by
+        # start_time. They double as the indexes of the foreign keys.
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.CheckConstraint('end_time > start_time', name='Show_end_time_after_start_time'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
+    start_time = db.Column(db.DateTime())
+    # Exclusive, see the Scheduling section
+    end_time = db.Column(db.DateTime(), nullable=False, default=default_end_time)
+    artist = db.relationship("Artist", backref="shows")
+    venue = db.relationship("Venue", backref="shows")
+
+    def __repr__(self):
+      return f'<Show date: {self.start_time}, {self.artist.name} playing at {self.venue.name}>'
+
+class ShowFeed(db.Model):
+    # Upcoming shows with their artist's and venue's names, see the Show feed
+    # section
+    __tablename__ = 'ShowFeed'
+    __table_args__ = (
+        # Keyset pagination of /shows
+        db.Index('ix_ShowFeed_start_time_show_id', 'start_time', 'show_id'),
+    )
+
+    show_id = db.Column(db.Integer, db.ForeignKey('Show.id', ondelete='CASCADE'), primary_key=True)
+    start_time = db.Column(db.DateTime(), nullable=False)
+    end_time = db.Column(db.DateTime(), nullable=False)
+    artist_id = db.Column(db.Integer, index=True)
+    venue_id = db.Column(db.Integer, index=True)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    venue_name = db.Column(db.String)
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        # Trigram GIN indexes back the ILIKE '%term%' search on Postgres
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        # Keyset pagination of /venues
+        db.Index('ix_Venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+        # Range scans of the geohash cells of /venues/nearby, covering the
+        # bounding box and upcoming shows filters
+        db.Index('ix_Venue_geohash', 'geohash', 'latitude', 'longitude', 'upcoming_shows_count'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    genre_links = db.relationship('VenueGenre', cascade='all, delete-orphan', order_by='VenueGenre.genre')
+    genres = association_proxy('genre_links', 'genre', creator=lambda genre: VenueGenre(genre=genre))
+    website = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean())
+    seeking_description = db.Column(db.String(120))
+    # Maintained counters, see the Show counters section
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Centroid of the city, see the Venue locations section
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+    artists = db.relationship("Artist", secondary=Show.__table__, backref='venues')
+    
+    def __repr__(self):
+        return f'<Venue :{self.name}>'
+
+    @classmethod
+    def get_with_shows_or_404(cls, venue_id):
+      # The venue, all its shows and their artists in a single joined query
+      return cls.query.options(
+          db.joinedload(cls.shows).joinedload(Show.artist),
+          db.selectinload(cls.genre_links)
+      ).filter(cls.id == venue_id).first_or_404()
+
+    def locate(self):
+      # Moves the venue to the centroid of its city
+      for name, value in venue_location(self.city, self.state).items():
+          setattr(self, name, value)
+
+class ShowCounterState(db.Model):
+    # Single row holding the time the show counters were rolled over at
+    __tablename__ = 'ShowCounterState'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime(), nullable=False)
+
+class Match(db.Model):
+    # Scored (artist, venue) pair, see the Matchmaking section
+    __tablename__ = 'Match'
+    __table_args__ = (
+        # Suggestions of an artist, of a venue, best first
+        db.Index('ix_Match_artist_id_artist_rank', 'artist_id', 'artist_rank'),
+        db.Index('ix_Match_venue_id_venue_rank', 'venue_id', 'venue_rank'),
+    )
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    # Rank among the suggested venues of the artist and among the suggested
+    # artists of the venue, none when not suggested
+    artist_rank = db.Column(db.Integer)
+    venue_rank = db.Column(db.Integer)
+
+# Created with every show counted as upcoming, the first roll-over moves the
+# past ones
+event.listen(
+    ShowCounterState.__table__, 'after_create',
+    DDL('INSERT INTO "ShowCounterState" (id, rolled_over_at) VALUES (1, \'1970-01-01 00:00:00\')')
+)
+
+def split_shows(shows, now=None):
+    # Split already loaded shows into (past, upcoming) against one captured
+    # "now": past shows most recent first, upcoming shows soonest first
+    now = now or datetime.now()
+    past = sorted((show for show in shows if show.start_time < now), key=lambda show: show.start_time, reverse=True)
+    upcoming = sorted((show for show in shows if show.start_time >= now), key=lambda show: show.start_time)
+    return past, upcoming
+      
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Artist and Venue keep upcoming_shows_count and past_shows_count so pages
+# read a column instead of counting shows. The counters are exact as of
+# ShowCounterState.rolled_over_at: shows starting before it are counted as
+# past, the others as upcoming. Writers adding or removing shows update the
+# counters in their own transaction, holding the state row in share mode,
+# and the roll-over job (show_counters.py) moves the shows started since the
+# last roll-over to the past counters holding it in update mode, so the two
+# never interleave. Between roll-overs the counters lag by at most the job's
+# interval.
+
+def show_counters_watermark(for_update=False):
+    return db.session.query(ShowCounterState.rolled_over_at).filter(
+        ShowCounterState.id == 1
+    ).with_for_update(read=not for_update).scalar()
+
+def count_show(show, delta=1):
+    # Adds delta to the counters of the show's artist and venue
+    watermark = show_counters_watermark()
+    column = 'past_shows_count' if show.start_time < watermark else 'upcoming_shows_count'
+    for model, model_id in ((Artist, show.artist_id), (Venue, show.venue_id)):
+        counter = getattr(model, column)
+        model.query.filter(model.id == model_id).update({counter: counter + delta}, synchronize_session=False)
+
+def update_counters(model, values):
+    # values are dicts of model_id, upcoming and past deltas
+    table = model.__table__
+    db.session.execute(
+        table.update().where(table.c.id == db.bindparam('model_id')).values(
+            upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('upcoming'),
+            past_shows_count=table.c.past_shows_count + db.bindparam('past'),
+        ),
+        values
+    )
+
+def count_shows(shows):
+    # count_show for a batch of shows (dicts of artist_id, venue_id and
+    # start_time), one executemany per model
+    watermark = show_counters_watermark()
+    for model, key in ((Artist, 'artist_id'), (Venue, 'venue_id')):
+        deltas = {}
+        for show in shows:
+            delta = deltas.setdefault(show[key], {'model_id': show[key], 'upcoming': 0, 'past': 0})
+            delta['past' if show['start_time'] < watermark else 'upcoming'] += 1
+        update_counters(model, list(deltas.values()))
+
+def uncount_venue_shows(venue_id):
+    # Removes the shows of the venue from the counters of their artists,
+    # before the shows are deleted
+    watermark = show_counters_watermark()
+    rows = db.session.query(
+        Show.artist_id,
+        db.func.sum(db.case([(Show.start_time >= watermark, 1)], else_=0)),
+        db.func.sum(db.case([(Show.start_time < watermark, 1)], else_=0)),
+    ).filter(Show.venue_id == venue_id).group_by(Show.artist_id).all()
+    if rows:
+        update_counters(Artist, [
+            {'model_id': artist_id, 'upcoming': -upcoming, 'past': -past} for artist_id, upcoming, past in rows
+        ])
+
+#----------------------------------------------------------------------------#
+# Show feed.
+#----------------------------------------------------------------------------#
+
+# ShowFeed holds a row per upcoming show carrying everything /shows displays,
+# so the page is a single range read of its (start_time, show_id) index. Rows
+# are added with their show and updated when the names of their artist or
+# venue change, in the writer's transaction. Past rows are pruned by a
+# scheduled job (show_feed.py) and are filtered out by readers meanwhile.
+
+FEED_COLUMNS = ['show_id', 'start_time', 'end_time', 'artist_id', 'venue_id', 'artist_name', 'artist_image_link', 'venue_name']
+
+def feed_rows(*criteria):
+    # Feed rows of the shows matching criteria, as a select
+    return db.select([
+        Show.id, Show.start_time, Show.end_time, Show.artist_id, Show.venue_id, Artist.name, Artist.image_link, Venue.name
+    ]).select_from(
+        Show.__table__.join(Artist.__table__, Artist.id == Show.artist_id).join(Venue.__table__, Venue.id == Show.venue_id)
+    ).where(db.and_(*criteria))
+
+def add_to_feed(*criteria):
+    db.session.execute(ShowFeed.__table__.insert().from_select(FEED_COLUMNS, feed_rows(*criteria)))
+
+def refresh_feed_artist(artist):
+    ShowFeed.query.filter(ShowFeed.artist_id == artist.id).update(
+        {'artist_name': artist.name, 'artist_image_link': artist.image_link}, synchronize_session=False
+    )
+
+def refresh_feed_venue(venue):
+    ShowFeed.query.filter(ShowFeed.venue_id == venue.id).update(
+        {'venue_name': venue.name}, synchronize_session=False
+    )
+
+#----------------------------------------------------------------------------#
+# Scheduling.
+#----------------------------------------------------------------------------#
+
+# A show books its artist and its venue for [start_time, end_time), and
+# bookings must not overlap. Shows last at most MAX_SHOW_DURATION, so the
+# shows overlapping a window all start less than that before it: a conflict
+# check is a bounded range read of the (artist_id|venue_id, start_time)
+# indexes however long the history. On Postgres, exclusion constraints over
+# tsrange(start_time, end_time) also refuse overlapping shows written
+# concurrently. Batches of shows are checked in memory, see Bookings.
+
+MAX_SHOW_DURATION = timedelta(minutes=MAX_SHOW_DURATION_MINUTES)
+# Longest window of /venues/<id>/availability
+MAX_AVAILABILITY_WINDOW = timedelta(days=366)
+
+event.listen(
+    db.metadata, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql')
+)
+for key in ('artist_id', 'venue_id'):
+    event.listen(
+        Show.__table__, 'after_create',
+        DDL(
+            f'ALTER TABLE "Show" ADD CONSTRAINT "Show_{key}_overlap_excl" '
+            f'EXCLUDE USING gist ({key} WITH =, tsrange(start_time, end_time) WITH &&)'
+        ).execute_if(dialect='postgresql')
+    )
+
+def show_duration(minutes):
+    # Duration of minutes, the default one when empty
+    if minutes is None or minutes == '':
+        return timedelta(minutes=DEFAULT_SHOW_DURATION_MINUTES)
+    duration = timedelta(minutes=int(minutes))
+    if not timedelta(0) < duration <= MAX_SHOW_DURATION:
+        raise ValueError(f'Shows last from 1 to {MAX_SHOW_DURATION_MINUTES} minutes')
+    return duration
+
+def overlapping(key, key_id, start_time, end_time):
+    # Criteria of the shows of an artist or a venue overlapping the window
+    return db.and_(
+        key == key_id,
+        Show.start_time > start_time - MAX_SHOW_DURATION,
+        Show.start_time < end_time,
+        Show.end_time > start_time,
+    )
+
+def booking_conflicts(artist_id, venue_id, start_time, end_time):
+    return Show.query.filter(db.or_(
+        overlapping(Show.artist_id, artist_id, start_time, end_time),
+        overlapping(Show.venue_id, venue_id, start_time, end_time),
+    )).order_by(Show.start_time).all()
+
+def describe_conflict(artist_id, booked_artist_id, start_time, end_time):
+    # Error of a show of artist_id overlapping a booked one
+    booked = 'The artist' if booked_artist_id == artist_id else 'The venue'
+    return f'{booked} is already booked from {start_time:%Y-%m-%d %H:%M} to {end_time:%Y-%m-%d %H:%M}.'
+
+def venue_bookings(venue_id, start_time, end_time):
+    # (id, artist_id, start_time, end_time) of the venue's shows overlapping
+    # the window, by start_time
+    return db.session.query(Show.id, Show.artist_id, Show.start_time, Show.end_time).filter(
+        overlapping(Show.venue_id, venue_id, start_time, end_time)
+    ).order_by(Show.start_time).all()
+
+def free_slots(bookings, start_time, end_time):
+    # (start, end) of the gaps of the window between the bookings, which are
+    # sorted by start_time
+    slots = []
+    free_from = start_time
+    for booking in bookings:
+        if booking.start_time > free_from:
+            slots.append((free_from, booking.start_time))
+        free_from = max(free_from, booking.end_time)
+    if free_from < end_time:
+        slots.append((free_from, end_time))
+    return slots
+
+# Windows per statement of Bookings.load. SQLite limits the depth of the OR
+# expression.
+OVERLAP_CHUNK_SIZE = 200
+
+@functools.lru_cache()
+def overlap_select(key):
+    # Select of the shows overlapping any of OVERLAP_CHUNK_SIZE windows of
+    # artists or venues, bound as key_<n>, after_<n> (start_time_<n> less
+    # MAX_SHOW_DURATION), start_time_<n> and end_time_<n>. Built once, large
+    # expressions are slow to build.
+    column = getattr(Show, key)
+    return db.select([Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.end_time]).where(db.or_(*[
+        db.and_(
+            column == db.bindparam(f'key_{n}'),
+            Show.start_time > db.bindparam(f'after_{n}'),
+            Show.start_time < db.bindparam(f'end_time_{n}'),
+            Show.end_time > db.bindparam(f'start_time_{n}'),
+        )
+        for n in range(OVERLAP_CHUNK_SIZE)
+    ]))
+
+class Bookings:
+    # Shows by artist and by venue in interval trees, to check a batch of
+    # shows against each other and the stored shows without a query per
+    # show. Shows are dicts of artist_id, venue_id, start_time and end_time.
+    def __init__(self):
+        self.trees = {}
+
+    def load(self, shows):
+        # Books the stored shows overlapping shows, reading the windows of
+        # OVERLAP_CHUNK_SIZE shows at a time through each index
+        stored = {}
+        for start in range(0, len(shows), OVERLAP_CHUNK_SIZE):
+            chunk = shows[start:start + OVERLAP_CHUNK_SIZE]
+            # The last chunk is padded, the same windows read again
+            chunk += chunk[-1:] * (OVERLAP_CHUNK_SIZE - len(chunk))
+            for key in ('artist_id', 'venue_id'):
+                params = {}
+                for n, show in enumerate(chunk):
+                    params[f'key_{n}'] = show[key]
+                    params[f'after_{n}'] = show['start_time'] - MAX_SHOW_DURATION
+                    params[f'start_time_{n}'] = show['start_time']
+                    params[f'end_time_{n}'] = show['end_time']
+                for row in db.session.execute(overlap_select(key), params):
+                    stored[row.id] = row
+        for row in stored.values():
+            self.book(dict(row._mapping))
+
+    def keys(self, show):
+        return (('artist', show['artist_id']), ('venue', show['venue_id']))
+
+    def conflicts(self, show):
+        # The booked shows overlapping show, by start_time
+        found = {}
+        for key in self.keys(show):
+            tree = self.trees.get(key)
+            if tree is not None:
+                for booked in tree.overlapping(show['start_time'], show['end_time']):
+                    found[id(booked)] = booked
+        return sorted(found.values(), key=lambda booked: booked['start_time'])
+
+    def book(self, show):
+        for key in self.keys(show):
+            if key not in self.trees:
+                self.trees[key] = IntervalTree()
+            self.trees[key].add(show['start_time'], show['end_time'], show)
+
+#----------------------------------------------------------------------------#
+# Venue locations.
+#----------------------------------------------------------------------------#
+
+# Venues are placed at the centroid of their city and indexed by the geohash
+# of their coordinates (geo.py). nearby_venues() reads the venues of the
+# cells covering a circle, one range of the geohash index per cell, and keeps
+# the ones inside it. The nearest venues are searched in circles growing from
+# FIRST_RADIUS_MILES: once a circle holds enough venues no venue outside of
+# it is nearer, so a dense area never reads every venue of a wide circle.
+
+def venue_location(city, state, latitude=None, longitude=None):
+    # Location columns of a venue: the given coordinates, else the centroid
+    # of its city, else none
+    if latitude is None or longitude is None:
+        latitude, longitude = city_centroid(city, state) or (None, None)
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'geohash': geohash(latitude, longitude) if latitude is not None else None,
+    }
+
+def in_cells(cells):
+    ranges = []
+    for cell in cells:
+        end = next_cell(cell)
+        ranges.append(db.and_(Venue.geohash >= cell, Venue.geohash < end) if end else Venue.geohash >= cell)
+    return db.or_(*ranges)
+
+def nearby_venues_query(latitude, longitude, radius, genre=None, upcoming=False):
+    # The venues of the cells covering the circle, inside its bounding box,
+    # only the venues of genre and, with upcoming, the ones with upcoming
+    # shows
+    south, west, north, east = bounding_box(latitude, longitude, radius)
+    query = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude, Venue.upcoming_shows_count
+    ).filter(
+        in_cells(covering_cells(latitude, longitude, radius)),
+        Venue.latitude.between(south, north),
+        Venue.longitude.between(west, east)
+    )
+    if genre:
+        # Checked per venue of the cells, through the VenueGenre primary key:
+        # the cells of a circle hold far fewer venues than a genre
+        query = query.filter(db.exists().where(db.and_(VenueGenre.venue_id == Venue.id, VenueGenre.genre == genre)))
+    if upcoming:
+        query = query.filter(Venue.upcoming_shows_count > 0)
+    return query
+
+def nearby_venues(latitude, longitude, radius, genre=None, upcoming=False, limit=None):
+    # (venue row, distance in miles) of the venues of nearby_venues_query()
+    # within radius miles, nearest first, the limit nearest ones
+    circle = min(radius, FIRST_RADIUS_MILES) if limit else radius
+    while True:
+        venues = []
+        for venue in nearby_venues_query(latitude, longitude, circle, genre, upcoming):
+            venue_distance = distance(latitude, longitude, venue.latitude, venue.longitude)
+            if venue_distance <= circle:
+                venues.append((venue, venue_distance))
+        if circle >= radius or len(venues) >= limit:
+            break
+        circle = min(circle * 4, radius)
+    venues.sort(key=lambda pair: (pair[1], pair[0].id))
+    return venues[:limit] if limit else venues
+
+#----------------------------------------------------------------------------#
+# Matchmaking.
+#----------------------------------------------------------------------------#
+
+# Match holds the suggested venues of each artist and the suggested artists
+# of each venue, scored by the rescore_matches batch job (match_scores.py,
+# scoring in matchmaking.py) over every artist and venue at once. The
+# suggestions are read as stored, one index range per artist or venue, and
+# lag the edits made since the last run.
+
+def match_profiles(model):
+    # (id, seeking, city, state) rows of every artist or venue, by id, and
+    # their (id, genre) rows
+    if model is Artist:
+        seeking, owner, genre = Artist.seeking_venue, ArtistGenre.artist_id, ArtistGenre.genre
+    else:
+        seeking, owner, genre = Venue.seeking_talent, VenueGenre.venue_id, VenueGenre.genre
+    rows = db.session.query(model.id, seeking, model.city, model.state).order_by(model.id).yield_per(10000)
+    genre_rows = db.session.query(owner, genre).yield_per(10000)
+    return rows, genre_rows
+
+def past_show_pairs(now=None):
+    # (artist id, venue id, past shows) of the artists and venues having
+    # played together
+    now = now or datetime.now()
+    return db.session.query(Show.artist_id, Show.venue_id, db.func.count(Show.id)).filter(
+        Show.start_time < now, Show.artist_id.isnot(None), Show.venue_id.isnot(None)
+    ).group_by(Show.artist_id, Show.venue_id)
+
+def suggested_venues(artist_id):
+    # The suggested venues of the artist with their score, best first
+    return db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.seeking_talent, Venue.upcoming_shows_count, Match.score
+    ).join(Venue, Venue.id == Match.venue_id).filter(
+        Match.artist_id == artist_id, Match.artist_rank.isnot(None)
+    ).order_by(Match.artist_rank)
+
+def suggested_artists(venue_id):
+    # The suggested artists of the venue with their score, best first
+    return db.session.query(
+        Artist.id, Artist.name, Artist.city, Artist.state, Artist.seeking_venue, Artist.upcoming_shows_count, Match.score
+    ).join(Artist, Artist.id == Match.artist_id).filter(
+        Match.venue_id == venue_id, Match.venue_rank.isnot(None)
+    ).order_by(Match.venue_rank)
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Postgres: trigram GIN indexes on name and city serve the ILIKE '%term%'
+# filters and similarity() ranks the matches.
+# SQLite: an FTS5 trigram table per model ("ArtistSearch", "VenueSearch"),
+# kept in sync by triggers, serves the match and bm25 ranks it.
+# On both, genres matching the term are resolved against the Genre enum and
+# looked up through the (genre, id) index of the genre tables.
+
+event.listen(
+    db.metadata, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+def fts_statements(name):
+    # FTS5 table over name and city of table <name>, with its sync triggers
+    fts = f'{name}Search'
+    return [
+        f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+        f'name, city, content="{name}", content_rowid="id", tokenize="trigram")',
+        f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, name, city) VALUES (new.id, new.name, new.city); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name, city) VALUES (\'delete\', old.id, old.name, old.city); END',
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF name, city ON "{name}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name, city) VALUES (\'delete\', old.id, old.name, old.city); '
+        f'INSERT INTO "{fts}"(rowid, name, city) VALUES (new.id, new.name, new.city); END',
+    ]
+
+for model in (Artist, Venue):
+    for statement in fts_statements(model.__tablename__):
+        event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(
+        model.__table__, 'before_drop',
+        DDL(f'DROP TABLE IF EXISTS "{model.__tablename__}Search"').execute_if(dialect='sqlite')
+    )
+
+# Genre association column holding the owner id, per searchable model
+search_genre_columns = {
+    Artist: ArtistGenre.artist_id,
+    Venue: VenueGenre.venue_id,
+}
+
+def search(model, term):
+    # Case-insensitive partial match of term on name, city and genres, best
+    # matches first. Returns a query of model and its ascending sort keys.
+    pattern = f'%{term}%'
+    genre_column = search_genre_columns[model]
+    genre_link = genre_column.class_
+    genres = [choice.value for choice in Genre if term.lower() in choice.value.lower()]
+    dialect = db.engine.dialect.name
+
+    # FTS5 trigram matching needs at least three characters
+    if dialect == 'sqlite' and len(term) >= 3:
+        fts = f'{model.__tablename__}Search'
+        fts_table = table(fts, column('rowid'), column('rank'))
+        matched = db.session.query(
+            fts_table.c.rowid.label('id'), fts_table.c.rank.label('rank')
+        ).filter(
+            db.text(f'"{fts}" MATCH :match').bindparams(match='"' + term.replace('"', '""') + '"')
+        )
+        if genres:
+            # Genre only matches rank after every name or city match
+            matched = matched.union_all(db.session.query(
+                genre_column.label('id'), literal(0.0).label('rank')
+            ).filter(genre_link.genre.in_(genres)))
+        matched = matched.subquery()
+        ranked = db.session.query(
+            matched.c.id, db.func.min(matched.c.rank).label('rank')
+        ).group_by(matched.c.id).subquery()
+        keys = [ranked.c.rank.label('search_rank'), model.name, model.id]
+        return model.query.join(ranked, ranked.c.id == model.id), keys
+
+    matches = [model.name.ilike(pattern), model.city.ilike(pattern)]
+    if genres:
+        matches.append(model.id.in_(db.session.query(genre_column).filter(genre_link.genre.in_(genres))))
+    query = model.query.filter(db.or_(*matches))
+    if dialect == 'postgresql':
+        rank = db.func.greatest(db.func.similarity(model.name, term), db.func.similarity(model.city, term))
+        return query, [(-rank).label('search_rank'), model.name, model.id]
+    return query, [model.name, model.id]
+
+def autocomplete_names(after=None):
+    # (kind, id, name) of every artist and venue, or with after of those whose
+    # id is above after[kind], for the autocomplete index (autocomplete.py)
+    for kind, model in (('artist', Artist), ('venue', Venue)):
+        query = db.session.query(model.id, model.name)
+        if after is not None:
+            query = query.filter(model.id > after[kind])
+        for id, name in query.yield_per(10000):
+            yield kind, id, name
@@ -0,0 +1,101 @@
+import sys
+import click
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import app
+from extensions import db
+from models import Artist, Venue, booking_conflicts, venue_bookings, nearby_venues_query, suggested_venues, suggested_artists
+from show_counters import COUNTED, started_shows
+from views import upcoming_show_page
+
+# Checks that the hot queries (detail pages, counter roll-over, /shows,
+# booking conflicts, venue availability) are served by the Show and ShowFeed
+# indexes, /venues/nearby by the Venue geohash index and the suggestions by
+# the Match indexes. The queries are run through the functions the views and
+# jobs call, and the statements they send are explained, so the check follows
+# any change of them. Run against a seeded database:
+#   FLASK_APP=query_plans.py flask check_query_plans
+
+EXPLAIN = {
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+@contextmanager
+def captured_statements():
+    # (statement, parameters) sent to the database inside the block
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    event.listen(Engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', capture)
+
+def explain(statement, parameters):
+    # Plan lines of statement, run on the DBAPI cursor so the plan rows are
+    # not processed as rows of the statement's columns
+    dialect = db.engine.dialect.name
+    cursor = db.session.connection().connection.cursor()
+    cursor.execute(EXPLAIN[dialect] + statement, parameters)
+    return [row[0] if dialect == 'postgresql' else row[-1] for row in cursor.fetchall()]
+
+def hot_queries(now, venue_id=1, artist_id=1):
+    # Calls running the hot queries, all reads
+    return {
+        'venue page': lambda: Venue.get_with_shows_or_404(venue_id),
+        'artist page': lambda: Artist.get_with_shows_or_404(artist_id),
+        'show counters roll-over': lambda: [
+            started_shows(key, now - timedelta(minutes=5), now).all() for _, key in COUNTED
+        ],
+        'booking conflicts': lambda: booking_conflicts(artist_id, venue_id, now, now + timedelta(hours=2)),
+        'venue availability': lambda: venue_bookings(venue_id, now, now + timedelta(days=30)),
+        'upcoming shows page': upcoming_show_page,
+        'venues nearby': lambda: nearby_venues_query(40.7128, -74.0060, 25, 'Jazz', True).all(),
+        'artist suggested venues': lambda: suggested_venues(artist_id).all(),
+        'venue suggested artists': lambda: suggested_artists(venue_id).all(),
+    }
+
+def uses_index(dialect, plan):
+    # True unless the plan reads the Show, ShowFeed, Venue or Match table with
+    # a sequential scan
+    tables = ('Show', 'Venue', 'Match')
+    if dialect == 'postgresql':
+        return not any(f'Seq Scan on "{name}' in line or f'Seq Scan on {name}' in line for line in plan for name in tables)
+    return not any(line.startswith(f'SCAN {name}') and 'USING' not in line for line in plan for name in tables)
+
+@app.cli.command('check_query_plans')
+def check_query_plans():
+    dialect = db.engine.dialect.name
+    if dialect not in EXPLAIN:
+        click.echo(f'Query plans can not be checked on {dialect}')
+        sys.exit(1)
+    if dialect == 'postgresql':
+        # Tiny seeded tables make any plan cheap, only check that an index
+        # can serve the query at all
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+
+    failed = False
+    for name, run in hot_queries(datetime.now()).items():
+        # The upcoming shows page reads its cursor from the request, a POST
+        # one so the reads go to the primary, where the plans are explained
+        with app.test_request_context(method='POST'), captured_statements() as statements:
+            run()
+        for statement, parameters in statements:
+            plan = explain(statement, parameters)
+            ok = uses_index(dialect, plan)
+            failed = failed or not ok
+            click.echo(f"{'ok' if ok else 'SEQUENTIAL SCAN'}: {name}")
+            for line in plan:
+                click.echo(f'    {line}')
+    db.session.rollback()
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    with app.app_context():
+        check_query_plans()
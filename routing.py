@@ -0,0 +1,105 @@
+import os
+import time
+import random
+import weakref
+
+from flask import g, request, session, current_app, has_app_context, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.engine.url import make_url
+
+# Read/write routing. GET and HEAD requests read from one of the read
+# replicas (SQLALCHEMY_REPLICA_URIS), picked once per request; everything
+# else (POST and DELETE handlers, CLI commands and jobs) uses the primary
+# (SQLALCHEMY_DATABASE_URI). After a request commits on the primary, the
+# user's session reads from the primary for READ_YOUR_WRITES_SECONDS, so
+# their own edits show up even while the replicas lag, and their requests
+# refresh the page cache instead of being served from it.
+
+# Pool settings SQLite file databases don't take, they are not pooled
+POOL_SIZE_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+def engine_options(backend, options):
+    options = dict(options)
+    if backend == 'sqlite':
+        for name in POOL_SIZE_OPTIONS:
+            options.pop(name, None)
+    return options
+
+def reads_from_primary():
+    # True when the current request must not read from a replica
+    if not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return True
+    return session.get('read_primary_until', 0) > time.time()
+
+def choose_replica(engines):
+    # Replica engine of the current request, None for the primary
+    if not engines or reads_from_primary():
+        return None
+    if 'replica_index' not in g:
+        g.replica_index = random.randrange(len(engines))
+    return engines[g.replica_index]
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        replica = choose_replica(self.app.extensions['read_replicas'])
+        if replica is not None:
+            return replica
+        return super().get_bind(mapper, clause)
+
+@event.listens_for(orm.Session, 'after_commit')
+def mark_write(db_session):
+    if has_app_context():
+        g.wrote_primary = True
+
+def sticky_reads():
+    if request.method in ('GET', 'HEAD') and reads_from_primary():
+        # Render from the primary and store the fresh page
+        g.page_cache_refresh = True
+
+def start_sticky_reads(response):
+    if g.get('wrote_primary'):
+        session['read_primary_until'] = time.time() + current_app.config.get('READ_YOUR_WRITES_SECONDS', 10)
+    return response
+
+# Apps whose engines are replaced in forked children. A child (e.g. a worker
+# of a preloading gunicorn) must not use the pooled connections of its
+# parent: their sockets are shared with it.
+forking_apps = weakref.WeakSet()
+
+def dispose_engines_after_fork():
+    for app in list(forking_apps):
+        get_state(app).db.dispose_engines(app, close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def init_app(self, app):
+        super().init_app(app)
+        forking_apps.add(app)
+        app.before_request(sticky_reads)
+        app.after_request(start_sticky_reads)
+        app.extensions['read_replicas'] = [
+            self.create_replica_engine(app, uri) for uri in app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+        ]
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_replica_engine(self, app, uri):
+        # Same options as the primary's engine
+        options = self.apply_pool_defaults(app, {})
+        sa_url, options = self.apply_driver_hacks(app, make_url(uri), options)
+        options.update(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        return self.create_engine(sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        return super().create_engine(sa_url, engine_options(sa_url.get_backend_name(), engine_opts))
+
+    def dispose_engines(self, app, close=True):
+        # Empties the pools of the engines created so far. close=False drops
+        # the connections without closing them, for a forked child.
+        engines = [self.get_engine(app, bind) for bind in list(get_state(app).connectors)]
+        for engine in engines + app.extensions['read_replicas']:
+            engine.dispose(close=close)
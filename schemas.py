@@ -0,0 +1,115 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+from marshmallow import fields
+from extensions import ma
+from models import Artist, Venue, Show, ShowFeed
+from serializers import CompiledSchema
+
+#----------------------------------------------------------------------------#
+# Schemas.
+#----------------------------------------------------------------------------#
+class VenueSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = Venue
+
+    id = ma.auto_field()
+    name = ma.auto_field()
+    city = ma.auto_field()
+    state = ma.auto_field()
+    phone = ma.auto_field()
+    image_link = ma.auto_field()
+    facebook_link = ma.auto_field()
+    genres = fields.Method("get_genres")
+    website = ma.auto_field()
+    seeking_talent = ma.auto_field()
+    seeking_description = ma.auto_field()
+    latitude = ma.auto_field()
+    longitude = ma.auto_field()
+    num_upcoming_shows = fields.Integer(attribute="upcoming_shows_count")
+
+    def get_genres(self, obj):
+        return list(obj.genres)
+
+class ShowSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = Show
+    
+    venue_id = ma.auto_field()
+    venue_name = fields.Method("get_venue_name")
+    artist_id = ma.auto_field()
+    artist_name = fields.Method("get_artist_name")
+    artist_image_link = fields.Method("get_artist_image_link")
+    start_time = ma.auto_field()
+
+    def get_artist_name(self, obj):
+        return  obj.artist.name
+
+    def get_artist_image_link(self, obj):
+        return  obj.artist.image_link
+
+    def get_venue_name(self, obj):
+        return  obj.venue.name
+
+class ShowFeedSchema(ma.SQLAlchemySchema):
+    # Same output as ShowSchema, read from the feed
+    class Meta:
+        model = ShowFeed
+
+    venue_id = ma.auto_field()
+    venue_name = ma.auto_field()
+    artist_id = ma.auto_field()
+    artist_name = ma.auto_field()
+    artist_image_link = ma.auto_field()
+    start_time = ma.auto_field()
+    end_time = ma.auto_field()
+    id = ma.auto_field('show_id')
+
+class ArtistShowSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = Show
+        # include_relationships = True
+        field = ('start_time',)
+
+class ArtistSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = Artist
+
+    id = ma.auto_field()
+    name = ma.auto_field()
+    city = ma.auto_field()
+    state = ma.auto_field()
+    phone = ma.auto_field()
+    image_link = ma.auto_field()
+    facebook_link = ma.auto_field()
+    genres = fields.Method("get_genres")
+    website = ma.auto_field()
+    seeking_venue = ma.auto_field()
+    seeking_description = ma.auto_field()
+    shows = ma.Nested(ArtistShowSchema, many=True)
+    num_upcoming_shows = fields.Integer(attribute="upcoming_shows_count")
+
+    def get_genres(self, obj):
+        return list(obj.genres)
+
+class VenueDetailSchema(VenueSchema):
+    # A venue with its shows, like ArtistSchema, for the detail endpoint only:
+    # the listing does not load the shows
+    shows = ma.Nested(ArtistShowSchema, many=True)
+
+artist_schema = ArtistSchema()
+venue_schema = VenueSchema()
+venue_detail_schema = VenueDetailSchema()
+show_schema = ShowSchema()
+
+artists_schema = ArtistSchema(many=True)
+venues_schema = VenueSchema(many=True)
+shows_schema = ShowSchema(many=True)
+show_feed_schema = ShowFeedSchema(many=True)
+
+# Precompiled dumpers of the same schemas, for the JSON API
+api_artist_schema = CompiledSchema(artist_schema)
+api_venue_schema = CompiledSchema(venue_schema)
+api_venue_detail_schema = CompiledSchema(venue_detail_schema)
+api_show_schema = CompiledSchema(show_schema)
+api_show_feed_schema = CompiledSchema(show_feed_schema)
@@ -1,69 +1,385 @@
+import io
+import os
 import json
+import random
 import click
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
 from dateutil.parser import parse
-from app import db, Artist, Venue, Show
+from app import app
+from extensions import db
+from models import Artist, Venue, Show, ArtistGenre, VenueGenre, Bookings, show_duration, venue_location
+from show_counters import repair_all, roll_over
+import show_feed
+from enums import Genre
 
-from flask import Flask 
-from flask.cli import AppGroup
+# Loads artists, venues and shows with batched inserts: COPY FROM STDIN on
+# Postgres, executemany everywhere else. Input files are streamed, either
+# JSON arrays (like the fixtures) or NDJSON (one object per line, .ndjson or
+# .jsonl), so they are never held in memory as a whole. Artists and venues
+# must carry their id so their genres can be linked. Shows carry an
+# end_time or a duration in minutes, the default one otherwise, and the ones
+# overlapping an earlier show of the same artist or venue in the input are
+# skipped (--no-check-conflicts trusts the input instead, and keeps no
+# shows in memory).
+#
+#   FLASK_APP=seed_database.py flask seed_db
+#   FLASK_APP=seed_database.py flask generate_data --shows 1000000 --load
 
-app = Flask(__name__)
+DEFAULT_BATCH_SIZE = 5000
+
+#----------------------------------------------------------------------------#
+# Input.
+#----------------------------------------------------------------------------#
+
+def iter_json_array(json_file, chunk_size=65536):
+    # Objects of a top level JSON array, decoded as the file is read
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise ValueError('Expected a JSON array')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started and buffer[:1] == ',':
+            buffer = buffer[1:]
+            continue
+        if started and buffer[:1] == ']':
+            return
+        if buffer and started:
+            try:
+                element, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                yield element
+                buffer = buffer[end:]
+                continue
+        if eof:
+            return
+        chunk = json_file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+def iter_records(path):
+    with open(path) as json_file:
+        if path.endswith(('.ndjson', '.jsonl')):
+            for line in json_file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(json_file)
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+#----------------------------------------------------------------------------#
+# Rows.
+#----------------------------------------------------------------------------#
+
+def artist_row(element):
+    return {
+        'id': element['id'],
+        'name': element.get('name', ''),
+        'city': element.get('city', ''),
+        'state': element.get('state', ''),
+        'phone': element.get('phone', ''),
+        'website': element.get('website', ''),
+        'facebook_link': element.get('facebook_link', ''),
+        'seeking_venue': element.get('seeking_venue', False),
+        'seeking_description': element.get('seeking_description', ''),
+        'image_link': element.get('image_link', ''),
+    }
+
+def venue_row(element):
+    return {
+        'id': element['id'],
+        'name': element.get('name', ''),
+        'address': element.get('address', ''),
+        'city': element.get('city', ''),
+        'state': element.get('state', ''),
+        'phone': element.get('phone', ''),
+        'website': element.get('website', ''),
+        'facebook_link': element.get('facebook_link', ''),
+        'seeking_talent': element.get('seeking_talent', False),
+        'seeking_description': element.get('seeking_description', ''),
+        'image_link': element.get('image_link', ''),
+        # Optional latitude and longitude, the city centroid otherwise
+        **venue_location(element.get('city'), element.get('state'), element.get('latitude'), element.get('longitude')),
+    }
+
+def parse_datetime(value):
+    # fromisoformat is much faster than dateutil for the generated data
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parse(value)
+
+def show_row(element):
+    start_time = element.get('start_time')
+    start_time = parse_datetime(start_time) if isinstance(start_time, str) else start_time
+    end_time = element.get('end_time')
+    if end_time is None:
+        end_time = start_time + show_duration(element.get('duration'))
+    return {
+        'artist_id': element.get('artist_id'),
+        'venue_id': element.get('venue_id'),
+        'start_time': start_time,
+        'end_time': parse_datetime(end_time) if isinstance(end_time, str) else end_time,
+    }
+
+def genre_rows(key, element):
+    return [{key: element['id'], 'genre': genre} for genre in Genre.normalize(element.get('genres', []))]
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+def copy_value(value):
+    # Value in the text format of COPY
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def insert_rows(table, rows):
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        columns = list(rows[0].keys())
+        data = io.StringIO()
+        for row in rows:
+            data.write('\t'.join(copy_value(row[column]) for column in columns))
+            data.write('\n')
+        data.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            'COPY "{}" ({}) FROM STDIN'.format(table.name, ', '.join(f'"{column}"' for column in columns)),
+            data
+        )
+    else:
+        connection.execute(table.insert(), rows)
+
+def load(elements, table, to_row, genre_table=None, genre_key=None, batch_size=DEFAULT_BATCH_SIZE, check=None):
+    # Inserts the elements batch by batch, one transaction per batch. check
+    # filters the rows of a batch.
+    count = 0
+    for batch in batches(elements, batch_size):
+        rows = [to_row(element) for element in batch]
+        if check is not None:
+            rows = check(rows)
+        insert_rows(table, rows)
+        if genre_table is not None:
+            insert_rows(genre_table, [row for element in batch for row in genre_rows(genre_key, element)])
+        db.session.commit()
+        count += len(rows)
+    return count
+
+def show_checker(bookings):
+    # Keeps the shows not overlapping the ones booked before them
+    def check(rows):
+        kept = []
+        for row in rows:
+            conflicts = bookings.conflicts(row)
+            if conflicts:
+                click.echo(
+                    f"Skipped the show of artist {row['artist_id']} at venue {row['venue_id']} "
+                    f"at {row['start_time']}: overlaps {len(conflicts)} show(s)",
+                    err=True
+                )
+                continue
+            bookings.book(row)
+            kept.append(row)
+        return kept
+    return check
+
+def reset_sequences():
+    # Explicit ids were inserted, move the Postgres id sequences past them
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for name in ('Artist', 'Venue', 'Show'):
+        db.session.execute(db.text(
+            f'SELECT setval(pg_get_serial_sequence(\'"{name}"\', \'id\'), COALESCE(MAX(id), 1)) FROM "{name}"'
+        ))
+    db.session.commit()
+
+def load_all(artists, venues, shows, batch_size=DEFAULT_BATCH_SIZE, check_conflicts=True):
+    counts = (
+        load(artists, Artist.__table__, artist_row, ArtistGenre.__table__, 'artist_id', batch_size),
+        load(venues, Venue.__table__, venue_row, VenueGenre.__table__, 'venue_id', batch_size),
+        load(shows, Show.__table__, show_row, batch_size=batch_size, check=show_checker(Bookings()) if check_conflicts else None),
+    )
+    reset_sequences()
+    # The loader bypasses the show counters and the feed, rebuild them
+    repair_all()
+    roll_over()
+    show_feed.rebuild()
+    return counts
 
 @app.cli.command("seed_db")
-def seed_db():
-    with open('db/fixtures/artists_seed.json') as json_file:
-        seed_data = json.load(json_file)
-        for element in seed_data:
-            new_object = Artist()
-            new_object.id = element.get('id')
-            new_object.name = element.get('name', '')
-            new_object.genres = ','.join(element.get('genres', ''))
-            new_object.city = element.get('city', '')
-            new_object.state = element.get('state', '')
-            new_object.phone = element.get('phone', '')
-            new_object.website = element.get('website', '')
-            new_object.facebook_link = element.get('facebook_link', '')
-            new_object.seeking_venue = element.get('seeking_venue', '')
-            new_object.seeking_description  = element.get('seeking_description', '')
-            new_object.image_link = element.get('image_link', '')
-
-            db.session.add(new_object)
-            db.session.commit()
-
-    with open('db/fixtures/venues_seed.json') as json_file:
-        seed_data = json.load(json_file)
-        for element in seed_data:
-            new_object = Venue()
-            new_object.id = element.get('id')
-            new_object.name = element.get('name', '')
-            new_object.genres = ','.join(element.get('genres', ''))
-            new_object.address = element.get('address', '')
-            new_object.city = element.get('city', '')
-            new_object.state = element.get('state', '')
-            new_object.phone = element.get('phone', '')
-            new_object.website = element.get('website', '')
-            new_object.facebook_link = element.get('facebook_link', '')
-            new_object.seeking_talent = element.get('seeking_talent', '')
-            new_object.seeking_description  = element.get('seeking_description', '')
-            new_object.image_link = element.get('image_link', '')
-
-            db.session.add(new_object)
-            db.session.commit()
-
-
-    with open('db/fixtures/shows_seed.json') as json_file:
-        seed_data = json.load(json_file)
-        for element in seed_data:
-            new_object = Show()
-            new_object.artist_id = element.get('artist_id')
-            new_object.venue_id = element.get('venue_id')
-            new_object.start_time = parse(element.get('start_time'))
-
-            db.session.add(new_object)
-            db.session.commit()
-
-
-# app.cli.add_command(user_cli)
+@click.option('--artists', default='db/fixtures/artists_seed.json', help='Artists JSON or NDJSON file')
+@click.option('--venues', default='db/fixtures/venues_seed.json', help='Venues JSON or NDJSON file')
+@click.option('--shows', default='db/fixtures/shows_seed.json', help='Shows JSON or NDJSON file')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--check-conflicts/--no-check-conflicts', default=True, help='Skip the shows overlapping earlier ones')
+def seed_db(artists, venues, shows, batch_size, check_conflicts):
+    counts = load_all(iter_records(artists), iter_records(venues), iter_records(shows), batch_size, check_conflicts)
+    click.echo('Loaded {} artists, {} venues and {} shows'.format(*counts))
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+    ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+    ('Dallas', 'TX'), ('San Jose', 'CA'), ('Austin', 'TX'), ('Jacksonville', 'FL'),
+    ('Columbus', 'OH'), ('Charlotte', 'NC'), ('San Francisco', 'CA'), ('Indianapolis', 'IN'),
+    ('Seattle', 'WA'), ('Denver', 'CO'), ('Washington', 'DC'), ('Boston', 'MA'),
+    ('Nashville', 'TN'), ('Detroit', 'MI'), ('Portland', 'OR'), ('Las Vegas', 'NV'),
+    ('Memphis', 'TN'), ('Baltimore', 'MD'), ('Milwaukee', 'WI'), ('Atlanta', 'GA'),
+    ('New Orleans', 'LA'), ('Minneapolis', 'MN'),
+]
+ADJECTIVES = [
+    'Wild', 'Electric', 'Velvet', 'Golden', 'Midnight', 'Crimson', 'Silent', 'Lucky',
+    'Broken', 'Neon', 'Blue', 'Rolling', 'Howling', 'Dusty', 'Cosmic', 'Sweet',
+]
+NOUNS = [
+    'Sax', 'Petals', 'Wolves', 'Pianos', 'Echoes', 'Drifters', 'Ramblers', 'Strings',
+    'Horns', 'Tigers', 'Saints', 'Riders', 'Comets', 'Vipers', 'Shadows', 'Owls',
+]
+VENUE_KINDS = ['Hall', 'Lounge', 'Bar', 'Club', 'Theater', 'Room', 'Garden', 'Coffee House']
+STREETS = ['Main', 'Oak', 'Folsom', 'Delancey', 'Market', 'Broadway', 'Elm', 'Sunset']
+GENRES = [choice.value for choice in Genre]
+
+def phone(rng):
+    return '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(100, 999), rng.randint(0, 9999))
+
+def generate_artists(count, rng):
+    for artist_id in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        seeking = rng.random() < 0.3
+        yield {
+            'id': artist_id,
+            'name': 'The {} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(NOUNS), artist_id),
+            'genres': rng.sample(GENRES, rng.randint(1, 3)),
+            'city': city,
+            'state': state,
+            'phone': phone(rng),
+            'website': f'https://artist{artist_id}.example.com',
+            'facebook_link': f'https://www.facebook.com/artist{artist_id}',
+            'seeking_venue': seeking,
+            'seeking_description': 'Looking for shows to perform at.' if seeking else '',
+            'image_link': f'https://images.example.com/artists/{artist_id}.jpg',
+        }
+
+def generate_venues(count, rng):
+    for venue_id in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        seeking = rng.random() < 0.4
+        yield {
+            'id': venue_id,
+            'name': 'The {} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(VENUE_KINDS), venue_id),
+            'genres': rng.sample(GENRES, rng.randint(1, 5)),
+            'address': '{} {} Street'.format(rng.randint(1, 9999), rng.choice(STREETS)),
+            'city': city,
+            'state': state,
+            'phone': phone(rng),
+            'website': f'https://venue{venue_id}.example.com',
+            'facebook_link': f'https://www.facebook.com/venue{venue_id}',
+            'seeking_talent': seeking,
+            'seeking_description': 'We are looking for local artists.' if seeking else '',
+            'image_link': f'https://images.example.com/venues/{venue_id}.jpg',
+        }
+
+# Days of the generated shows, before and after today
+SHOW_PAST_DAYS = 3 * 365
+SHOW_FUTURE_DAYS = 2 * 365
+# Share of the free (artist, day) and (venue, day) slots shows may take at
+# most: drawing a free slot takes about 1 / (1 - share) attempts per side
+MAX_SHOW_DENSITY = 0.5
+
+def max_generated_shows(artists, venues, past_days=SHOW_PAST_DAYS, future_days=SHOW_FUTURE_DAYS):
+    return int(min(artists, venues) * (past_days + future_days + 1) * MAX_SHOW_DENSITY)
+
+def generate_shows(count, artists, venues, rng, past_days=SHOW_PAST_DAYS, future_days=SHOW_FUTURE_DAYS):
+    # Evening shows spread over the past and upcoming years. Shows end by
+    # 4am, so one show a day per artist and per venue never overlaps.
+    if count > max_generated_shows(artists, venues, past_days, future_days):
+        raise ValueError(f'{count} shows do not fit the days of {artists} artists and {venues} venues')
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    artist_days = set()
+    venue_days = set()
+    for _ in range(count):
+        while True:
+            artist_id = rng.randint(1, artists)
+            venue_id = rng.randint(1, venues)
+            day = rng.randint(-past_days, future_days)
+            if (artist_id, day) not in artist_days and (venue_id, day) not in venue_days:
+                break
+        artist_days.add((artist_id, day))
+        venue_days.add((venue_id, day))
+        yield {
+            'artist_id': artist_id,
+            'venue_id': venue_id,
+            'start_time': (today + timedelta(days=day, hours=rng.randint(18, 23), minutes=rng.choice((0, 30)))).isoformat(),
+            'duration': rng.choice((60, 90, 120, 180, 240)),
+        }
+
+def write_ndjson(path, elements):
+    with open(path, 'w') as ndjson_file:
+        for element in elements:
+            ndjson_file.write(json.dumps(element))
+            ndjson_file.write('\n')
+
+@app.cli.command("generate_data")
+@click.option('--artists', default=10000, show_default=True)
+@click.option('--venues', default=2000, show_default=True)
+@click.option('--shows', default=100000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Random seed, same seed same data')
+@click.option('--out', default='db/generated', show_default=True, help='Directory of the NDJSON files')
+@click.option('--load/--no-load', 'load_data', default=False, help='Load into the database instead of writing files')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True)
+def generate_data(artists, venues, shows, seed, out, load_data, batch_size):
+    # Checked before anything is written, the shows are generated last
+    if shows > max_generated_shows(artists, venues):
+        raise click.BadParameter(
+            f'at most {max_generated_shows(artists, venues)} shows for {artists} artists and {venues} venues',
+            param_hint='--shows'
+        )
+    rng = random.Random(seed)
+    generated = (
+        generate_artists(artists, rng),
+        generate_venues(venues, rng),
+        generate_shows(shows, artists, venues, rng),
+    )
+    if load_data:
+        # The generated shows never overlap
+        counts = load_all(*generated, batch_size=batch_size, check_conflicts=False)
+        click.echo('Loaded {} artists, {} venues and {} shows'.format(*counts))
+        return
+
+    os.makedirs(out, exist_ok=True)
+    for name, elements in zip(('artists', 'venues', 'shows'), generated):
+        write_ndjson(os.path.join(out, f'{name}.ndjson'), elements)
+    click.echo(f'Wrote {artists} artists, {venues} venues and {shows} shows to {out}')
+
+
 if __name__ == '__main__':
-    seed_db()
\ No newline at end of file
+    app.cli()
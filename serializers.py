@@ -0,0 +1,82 @@
+from marshmallow import Schema, fields
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+
+# Precompiled dumpers for marshmallow schemas. A schema's dump fields are
+# turned once into the source of a single function building the output dict,
+# e.g. for ShowSchema
+#
+#   def dump(obj):
+#       return {'venue_id': obj.venue_id, 'venue_name': f1(obj), ...,
+#               'start_time': iso(obj.start_time)}
+#
+# so a dump no longer walks the fields, their attribute lookups and their
+# serialize() calls per object. Column fields are read as is: the values come
+# from the database with their Python type already. Field types without a
+# fast path fall back to their own serialize(). pre_dump and post_dump hooks
+# of the schema still run, once per dump.
+
+# Fields whose column values are dumped unchanged
+PLAIN_FIELDS = (fields.Integer, fields.String, fields.Boolean)
+
+def iso(value):
+    return value.isoformat() if value is not None else None
+
+def dump_nested_many(dumper, values):
+    return dumper.dump(values, many=True) if values is not None else None
+
+def dump_nested(dumper, value):
+    return dumper.dump(value) if value is not None else None
+
+class CompiledSchema:
+    def __init__(self, schema):
+        self.schema = schema
+        self.dump_object = compile_dump_function(schema)
+        self.has_pre_dump = bool(schema._hooks[PRE_DUMP])
+        self.has_post_dump = bool(schema._hooks[POST_DUMP])
+
+    def dump(self, obj, many=None):
+        schema = self.schema
+        many = schema.many if many is None else many
+        if self.has_pre_dump:
+            obj = schema._invoke_dump_processors(PRE_DUMP, obj, many=many, original_data=obj)
+        if many:
+            dump_object = self.dump_object
+            result = [dump_object(item) for item in obj]
+        else:
+            result = self.dump_object(obj)
+        if self.has_post_dump:
+            result = schema._invoke_dump_processors(POST_DUMP, result, many=many, original_data=obj)
+        return result
+
+def compile_dump_function(schema):
+    namespace = {'iso': iso}
+    items = []
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else name
+        attribute = field.attribute or name
+        helper = f'f{index}'
+        if not attribute.isidentifier():
+            namespace[helper] = field
+            expression = f'{helper}.serialize({name!r}, obj)'
+        elif isinstance(field, fields.Method):
+            namespace[helper] = getattr(schema, field.serialize_method_name)
+            expression = f'{helper}(obj)'
+        elif type(field) in PLAIN_FIELDS:
+            expression = f'obj.{attribute}'
+        elif type(field) is fields.DateTime and field.format in (None, 'iso'):
+            expression = f'iso(obj.{attribute})'
+        elif isinstance(field, fields.Nested) and isinstance(field.schema, Schema):
+            namespace[helper] = CompiledSchema(field.schema)
+            if field.many:
+                expression = f'dump_nested_many({helper}, obj.{attribute})'
+            else:
+                expression = f'dump_nested({helper}, obj.{attribute})'
+        else:
+            namespace[helper] = field
+            expression = f'{helper}.serialize({name!r}, obj)'
+        items.append(f'{key!r}: {expression}')
+
+    namespace.update(dump_nested_many=dump_nested_many, dump_nested=dump_nested)
+    source = 'def dump(obj):\n    return {' + ', '.join(items) + '}\n'
+    exec(compile(source, f'<dump {type(schema).__name__}>', 'exec'), namespace)
+    return namespace['dump']
@@ -0,0 +1,116 @@
+import sys
+import click
+
+from datetime import datetime
+from app import app
+from extensions import db, page_cache
+from models import Artist, Venue, Show, ShowCounterState, show_counters_watermark, update_counters
+
+# Jobs maintaining the upcoming/past show counters of artists and venues (see
+# the Show counters section of models.py).
+#
+# roll_over_show_counters moves the shows started since the last roll-over
+# from the upcoming to the past counters. Schedule it every few minutes, e.g.
+# with cron or the Heroku scheduler:
+#   FLASK_APP=show_counters.py flask roll_over_show_counters
+#
+# check_show_counters recounts the shows of every artist and venue and
+# reports, or with --repair fixes, the counters that drifted:
+#   FLASK_APP=show_counters.py flask check_show_counters --repair
+
+COUNTED = ((Artist, Show.artist_id), (Venue, Show.venue_id))
+# Cached pages showing the counters
+LISTING_TAGS = ('artists', 'venues')
+
+def started_shows(key, since, now):
+    # (artist or venue id, shows) of the shows started in [since, now), served
+    # by the (start_time, id) index on Show
+    return db.session.query(key, db.func.count(Show.id)).filter(
+        Show.start_time >= since, Show.start_time < now
+    ).group_by(key)
+
+def roll_over(now=None):
+    # Returns the number of shows moved to the past counters
+    now = now or datetime.now()
+    watermark = show_counters_watermark(for_update=True)
+    if now <= watermark:
+        db.session.rollback()
+        return 0
+    moved = 0
+    for model, key in COUNTED:
+        rows = started_shows(key, watermark, now).all()
+        if rows:
+            update_counters(model, [{'model_id': model_id, 'upcoming': -count, 'past': count} for model_id, count in rows])
+            # The same shows for artists and for venues
+            moved = sum(count for _, count in rows)
+    ShowCounterState.query.filter(ShowCounterState.id == 1).update({'rolled_over_at': now})
+    db.session.commit()
+    return moved
+
+def counter_drift(model, key):
+    # (id, upcoming_shows_count, past_shows_count, upcoming, past) of the
+    # artists or venues whose counters differ from their shows
+    watermark = show_counters_watermark()
+    counts = db.session.query(
+        key.label('model_id'),
+        db.func.sum(db.case([(Show.start_time >= watermark, 1)], else_=0)).label('upcoming'),
+        db.func.sum(db.case([(Show.start_time < watermark, 1)], else_=0)).label('past'),
+    ).group_by(key).subquery()
+    upcoming = db.func.coalesce(counts.c.upcoming, 0)
+    past = db.func.coalesce(counts.c.past, 0)
+    return db.session.query(
+        model.id, model.upcoming_shows_count, model.past_shows_count, upcoming, past
+    ).outerjoin(counts, counts.c.model_id == model.id).filter(
+        db.or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past)
+    ).order_by(model.id).all()
+
+def repair(model, drift):
+    update_counters(model, [
+        {'model_id': model_id, 'upcoming': upcoming - upcoming_count, 'past': past - past_count}
+        for model_id, upcoming_count, past_count, upcoming, past in drift
+    ])
+
+def repair_all():
+    # Recounts every counter, e.g. after a bulk load. Returns the number of
+    # rows repaired.
+    repaired = 0
+    for model, key in COUNTED:
+        drift = counter_drift(model, key)
+        if drift:
+            repair(model, drift)
+        repaired += len(drift)
+    db.session.commit()
+    return repaired
+
+@app.cli.command('roll_over_show_counters')
+def roll_over_show_counters():
+    moved = roll_over()
+    if moved:
+        page_cache.invalidate_from_cli(*LISTING_TAGS)
+    click.echo(f'Rolled over {moved} shows')
+
+@app.cli.command('check_show_counters')
+@click.option('--repair', 'fix', is_flag=True, help='Fix the counters that drifted')
+def check_show_counters(fix):
+    drifted = False
+    for model, key in COUNTED:
+        drift = counter_drift(model, key)
+        for model_id, upcoming_count, past_count, upcoming, past in drift:
+            click.echo(
+                f'{model.__name__} {model_id}: counted {upcoming_count} upcoming and {past_count} past shows, '
+                f'has {upcoming} and {past}'
+            )
+        if drift and fix:
+            repair(model, drift)
+        drifted = drifted or bool(drift)
+    db.session.commit()
+    if drifted and fix:
+        page_cache.invalidate_from_cli(*LISTING_TAGS)
+        click.echo('Repaired')
+    elif drifted:
+        sys.exit(1)
+    else:
+        click.echo('Counters are consistent')
+
+if __name__ == '__main__':
+    app.cli()
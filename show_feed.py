@@ -0,0 +1,39 @@
+import click
+
+from datetime import datetime
+from app import app
+from extensions import db
+from models import Show, ShowFeed, add_to_feed
+
+# Jobs maintaining the upcoming shows feed of /shows (see the Show feed
+# section of models.py).
+#
+# prune_show_feed deletes the rows of shows that started. Schedule it with
+# the show counters roll-over, e.g. every few minutes:
+#   FLASK_APP=show_feed.py flask prune_show_feed
+#
+# rebuild_show_feed recreates the feed from the shows, e.g. after a bulk load:
+#   FLASK_APP=show_feed.py flask rebuild_show_feed
+
+def prune(now=None):
+    # Served by the (start_time, show_id) index
+    pruned = ShowFeed.query.filter(ShowFeed.start_time < (now or datetime.now())).delete(synchronize_session=False)
+    db.session.commit()
+    return pruned
+
+def rebuild(now=None):
+    ShowFeed.query.delete(synchronize_session=False)
+    add_to_feed(Show.start_time >= (now or datetime.now()))
+    db.session.commit()
+    return ShowFeed.query.count()
+
+@app.cli.command('prune_show_feed')
+def prune_show_feed():
+    click.echo(f'Pruned {prune()} past shows')
+
+@app.cli.command('rebuild_show_feed')
+def rebuild_show_feed():
+    click.echo(f'Rebuilt the feed with {rebuild()} upcoming shows')
+
+if __name__ == '__main__':
+    app.cli()
@@ -0,0 +1,31 @@
+import sys
+import click
+
+from app import app
+from bulk import import_format, read_import, import_shows, IMPORT_BATCH_SIZE
+
+# Imports shows from a CSV or NDJSON file, like POST /shows/import (see the
+# Show import section of bulk.py), and prints the errors of the rows that
+# failed:
+#   FLASK_APP=show_import.py flask import_shows shows.csv
+
+@app.cli.command('import_shows')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+def import_shows_file(path, batch_size):
+    format = import_format(path)
+    if format is None:
+        raise click.BadParameter('Expected a .csv, .ndjson or .jsonl file', param_hint='PATH')
+    with open(path, 'rb') as import_file:
+        report = import_shows(read_import(import_file, format), batch_size)
+    for error in report['errors']:
+        for field, messages in error['errors'].items():
+            click.echo(f"Row {error['row']}: {field}: {' '.join(messages)}", err=True)
+    if report['failed'] > len(report['errors']):
+        click.echo(f"... and {report['failed'] - len(report['errors'])} more failed rows", err=True)
+    click.echo(f"Imported {report['imported']} shows, {report['failed']} rows failed")
+    if report['failed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    app.cli()
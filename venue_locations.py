@@ -0,0 +1,37 @@
+import click
+
+from app import app
+from extensions import db
+from models import Venue, venue_location
+
+# Places the venues at the centroid of their city, from db/city_centroids.csv
+# (see geo.py), batch by batch. Venues of cities missing from the table keep
+# no location, and are retried by the next run.
+#   FLASK_APP=venue_locations.py flask locate_venues
+#   FLASK_APP=venue_locations.py flask locate_venues --all
+
+LOCATE_BATCH_SIZE = 1000
+
+@app.cli.command('locate_venues')
+@click.option('--all', 'relocate', is_flag=True, help='Also relocate the venues located already')
+@click.option('--batch-size', default=LOCATE_BATCH_SIZE, show_default=True)
+def locate_venues(relocate, batch_size):
+    located = unknown = 0
+    last_id = 0
+    while True:
+        query = db.session.query(Venue.id, Venue.city, Venue.state).filter(Venue.id > last_id)
+        if not relocate:
+            query = query.filter(Venue.latitude.is_(None))
+        batch = query.order_by(Venue.id).limit(batch_size).all()
+        if not batch:
+            break
+        rows = [dict(venue_location(venue.city, venue.state), id=venue.id) for venue in batch]
+        db.session.bulk_update_mappings(Venue, rows)
+        db.session.commit()
+        located += sum(1 for row in rows if row['latitude'] is not None)
+        unknown += sum(1 for row in rows if row['latitude'] is None)
+        last_id = batch[-1].id
+    click.echo(f'Located {located} venues, {unknown} in cities missing from the centroid table')
+
+if __name__ == '__main__':
+    app.cli()
@@ -0,0 +1,918 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import sys
+import json
+import base64
+import dateutil.parser
+import babel
+from itertools import groupby
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    Response,
+    flash,
+    redirect,
+    url_for,
+    jsonify,
+    abort,
+    current_app,
+    stream_with_context,
+)
+from forms import *
+from enums import Genre
+from extensions import db, page_cache, request_metrics, autocomplete
+from cache import expire_at
+from models import (
+    Artist,
+    ArtistGenre,
+    Match,
+    Show,
+    ShowFeed,
+    Venue,
+    VenueGenre,
+    MAX_AVAILABILITY_WINDOW,
+    split_shows,
+    count_show,
+    uncount_venue_shows,
+    add_to_feed,
+    refresh_feed_artist,
+    refresh_feed_venue,
+    show_duration,
+    booking_conflicts,
+    describe_conflict,
+    venue_bookings,
+    free_slots,
+    nearby_venues,
+    suggested_venues,
+    suggested_artists,
+    search,
+)
+from schemas import (
+    artist_schema,
+    artists_schema,
+    venue_schema,
+    show_feed_schema,
+    api_artist_schema,
+    api_venue_schema,
+    api_venue_detail_schema,
+    api_show_schema,
+    api_show_feed_schema,
+)
+from bulk import import_format, read_import, import_shows, export_chunks, EXPORT_FORMATS
+from geo import DEFAULT_RADIUS_MILES, MAX_RADIUS_MILES
+
+from datetime import datetime, timedelta
+
+bp = Blueprint('main', __name__)
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+# Keyset pagination: pages are read with a row value comparison against the
+# sort keys of the last (or first) row seen, which an index on the same keys
+# serves directly, so page N costs the same as page 1. OFFSET is never used.
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_url(self):
+        return page_url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return page_url(before=self.prev_cursor) if self.prev_cursor else None
+
+def encode_cursor(values):
+    values = [{'datetime': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [dateutil.parser.parse(value['datetime']) if isinstance(value, dict) else value for value in values]
+    except (ValueError, TypeError, KeyError):
+        abort(400)
+
+def page_url(**cursor):
+    # Current url with the current filters (including a posted search_term)
+    # and the given after/before cursor
+    args = {key: value for key, value in request.values.items() if key not in ('after', 'before', 'csrf_token')}
+    args.update(request.view_args or {})
+    args.update(cursor)
+    return url_for(request.endpoint, **args)
+
+def paginate(query, keys, per_page=None):
+    # Reads the page of query selected by the ?after= / ?before= cursor, in
+    # ascending order of keys. Items are the query's entity when it selects a
+    # single one, otherwise its rows (with the keys as extra columns).
+    per_page = per_page or current_app.config.get('PAGE_SIZE', 50)
+    after = request.values.get('after')
+    before = request.values.get('before')
+    descriptions = query.column_descriptions
+    single_entity = len(descriptions) == 1 and descriptions[0]['type'] is descriptions[0]['entity']
+
+    query = query.add_columns(*keys).order_by(None)
+    if before:
+        query = query.filter(db.tuple_(*keys) < db.tuple_(*decode_cursor(before)))
+        query = query.order_by(*[db.desc(key) for key in keys])
+    else:
+        if after:
+            query = query.filter(db.tuple_(*keys) > db.tuple_(*decode_cursor(after)))
+        query = query.order_by(*keys)
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or before:
+            next_cursor = encode_cursor(rows[-1][-len(keys):])
+        if (has_more and before) or after:
+            prev_cursor = encode_cursor(rows[0][-len(keys):])
+    items = [row[0] for row in rows] if single_entity else rows
+    return Page(items, next_cursor, prev_cursor)
+
+def upcoming_show_page():
+    # Page of the upcoming shows of /shows and /api/v1/shows, a single range
+    # read of the feed's (start_time, show_id) index
+    return paginate(ShowFeed.query.filter(ShowFeed.start_time >= datetime.now()), [ShowFeed.start_time, ShowFeed.show_id])
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+@bp.app_template_filter('datetime')
+def format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format="EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format="EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+def genre_arg():
+    # Optional ?genre= filter of the listing pages, must be a Genre value
+    genre = request.args.get('genre')
+    if genre and genre not in [choice.value for choice in Genre]:
+        abort(400)
+    return genre
+
+def datetime_arg(name, default=None):
+    # Optional ?name= time, naive like the stored times
+    if not request.args.get(name):
+        return default
+    try:
+        value = dateutil.parser.parse(request.args[name])
+    except (ValueError, OverflowError):
+        abort(400)
+    if value.tzinfo:
+        abort(400)
+    return value
+
+def coordinate_arg(name, bound):
+    # Required ?name= coordinate in degrees, between -bound and bound
+    value = request.args.get(name, type=float)
+    if value is None or not -bound <= value <= bound:
+        abort(400)
+    return value
+
+def venue_cache_tags(venue_id):
+    # Pages showing the venue: its own page, the listings and the pages of
+    # the artists playing there
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    return ['venues', 'shows', f'venue:{venue_id}'] + [f'artist:{artist_id}' for (artist_id,) in artist_ids]
+
+def artist_cache_tags(artist_id):
+    # Pages showing the artist: its own page, the listings and the pages of
+    # the venues it plays at
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    return ['artists', 'shows', f'artist:{artist_id}'] + [f'venue:{venue_id}' for (venue_id,) in venue_ids]
+
+@bp.route('/')
+@page_cache.cached()
+def index():
+    return render_template('pages/home.html')
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+@page_cache.cached(tags=lambda: ['venues'])
+def venues():
+    # DONE: replace with real venues data.
+    #       num_shows should be aggregated based on number of upcoming shows per venue.
+
+    # Areas, venues and their upcoming show counts are built from one query,
+    # the counts are read from the maintained counter column
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+    genre = genre_arg()
+    if genre:
+        # Uses the (genre, venue_id) index on VenueGenre
+        query = query.join(VenueGenre, db.and_(VenueGenre.venue_id == Venue.id, VenueGenre.genre == genre))
+    # Paged by area first so the areas stay grouped, served by the
+    # (state, city, name, id) index on Venue
+    page = paginate(query, [Venue.state, Venue.city, Venue.name, Venue.id])
+
+    data = []
+    for (city, state), area_venues in groupby(page, key=lambda row: (row.city, row.state)):
+        city_area = {'city': city, 'state': state, 'venues': []}
+        for venue in area_venues:
+            city_area['venues'].append({
+                'id': venue.id,
+                'name': venue.name,
+                'num_upcoming_shows': venue.num_upcoming_shows,
+            })
+        data.append(city_area)
+
+    return render_template('pages/venues.html', areas=data, page=page)
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+def search_venues():
+    # DONE: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    # Further pages are requested with GET and carry the term in the url
+    response = {}
+    term = request.values.get('search_term', '')
+    page = paginate(*search(Venue, term))
+    response['data'] = page.items
+    response['count'] = len(response['data'])
+
+    return render_template('pages/search_venues.html', results=response, search_term=term, page=page)
+
+@bp.route('/venues/<int:venue_id>')
+@page_cache.cached(tags=lambda venue_id: [f'venue:{venue_id}'])
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    # DONE: replace with real venue data from the venues table, using venue_id
+
+    venue = Venue.get_with_shows_or_404(venue_id)
+    past, upcoming = split_shows(venue.shows)
+    if upcoming:
+        # The cached page is stale once its next show is a past show
+        expire_at(upcoming[0].start_time)
+    # Get the venue data from MA VenueSchema
+    data = venue_schema.dump(venue)
+    past_shows = []
+    upcoming_shows = []
+    for show in past:
+        show_json = {}
+        show_json['artist_id'] = show.artist_id
+        show_json['artist_name'] = show.artist.name
+        show_json['artist_image_link'] = show.artist.image_link
+        show_json['start_time'] = show.start_time.isoformat()
+        past_shows.append(show_json)
+
+    data['past_shows'] = past_shows
+
+    for show in upcoming:
+        show_json = {}
+        show_json['artist_id'] = show.artist_id
+        show_json['artist_name'] = show.artist.name
+        show_json['artist_image_link'] = show.artist.image_link
+        show_json['start_time'] = show.start_time.isoformat()
+        upcoming_shows.append(show_json)
+
+    data['upcoming_shows'] = upcoming_shows
+
+    data['past_shows_count'] = len(past_shows)
+    data['upcoming_shows_count'] = len(upcoming_shows)
+
+    return render_template('pages/show_venue.html', venue=data)
+
+@bp.route('/venues/nearby')
+def venues_nearby():
+    # Venues within ?radius= miles of ?lat= and ?lng=, nearest first, with
+    # the ?genre= and ?upcoming=1 (having upcoming shows) filters. Not
+    # cached, the coordinates make nearly every URL a new one.
+    latitude = coordinate_arg('lat', 90)
+    longitude = coordinate_arg('lng', 180)
+    radius = request.args.get('radius', DEFAULT_RADIUS_MILES, type=float)
+    if not 0 < radius <= MAX_RADIUS_MILES:
+        abort(400)
+    upcoming = request.args.get('upcoming') in ('1', 'true')
+    venues = nearby_venues(latitude, longitude, radius, genre_arg(), upcoming, current_app.config.get('PAGE_SIZE', 50))
+    return api_response([{
+        'id': venue.id,
+        'name': venue.name,
+        'city': venue.city,
+        'state': venue.state,
+        'latitude': venue.latitude,
+        'longitude': venue.longitude,
+        'distance': round(venue_distance, 2),
+        'num_upcoming_shows': venue.upcoming_shows_count,
+        'url': url_for('.show_venue', venue_id=venue.id),
+    } for venue, venue_distance in venues])
+
+@bp.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    # Free slots of the venue between ?from= (default now) and ?to= (default
+    # 30 days later), as JSON
+    start_time = datetime_arg('from', datetime.now().replace(microsecond=0))
+    end_time = datetime_arg('to', start_time + timedelta(days=30))
+    if not start_time < end_time <= start_time + MAX_AVAILABILITY_WINDOW:
+        abort(400)
+    if db.session.query(Venue.id).filter(Venue.id == venue_id).scalar() is None:
+        abort(404)
+
+    bookings = venue_bookings(venue_id, start_time, end_time)
+    return api_response({
+        'venue_id': venue_id,
+        'from': start_time.isoformat(),
+        'to': end_time.isoformat(),
+        'booked': [{
+            'show_id': booking.id,
+            'artist_id': booking.artist_id,
+            'start_time': booking.start_time.isoformat(),
+            'end_time': booking.end_time.isoformat(),
+        } for booking in bookings],
+        'free': [
+            {'start_time': start.isoformat(), 'end_time': end.isoformat()}
+            for start, end in free_slots(bookings, start_time, end_time)
+        ],
+    })
+
+@bp.route('/venues/<int:venue_id>/suggested-artists')
+@page_cache.cached(tags=lambda venue_id: ['matches', f'venue:{venue_id}'], etag=True)
+def venue_suggested_artists(venue_id):
+    # Artists matching the venue, best first, as scored by the last
+    # rescore_matches run (see the Matchmaking section of models.py)
+    if db.session.query(Venue.id).filter(Venue.id == venue_id).scalar() is None:
+        abort(404)
+    return api_response([{
+        'id': artist.id,
+        'name': artist.name,
+        'city': artist.city,
+        'state': artist.state,
+        'seeking_venue': artist.seeking_venue,
+        'num_upcoming_shows': artist.upcoming_shows_count,
+        'score': round(artist.score, 3),
+        'url': url_for('.show_artist', artist_id=artist.id),
+    } for artist in suggested_artists(venue_id)])
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()  
+    return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # DONE: insert form data as a new Venue record in the db, instead
+  # DONE: modify data to be the data object returned from db insertion
+    form = VenueForm()
+    list_genres = request.form.getlist('genres')
+    try:
+        new_venue = Venue(
+            name=request.form['name'],
+            city=request.form['city'],
+            state=request.form['state'],
+            address=request.form['address'],
+            phone=request.form['phone'],
+            # Genres are fetched as a list and stored one row per genre
+            genres = list_genres,
+            image_link=request.form['image_link'],
+            facebook_link=request.form['facebook_link'],
+            website=request.form['website'],
+            seeking_talent=True if request.form.get('seeking_talent') == 'y' else False,
+            seeking_description=request.form['seeking_description']
+        )
+        new_venue.locate()
+
+        db.session.add(new_venue)
+        db.session.flush()
+        venue_id = new_venue.id
+        db.session.commit()
+        page_cache.invalidate('venues')
+        autocomplete.add('venue', venue_id, request.form['name'])
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')   
+                
+    except Exception as e:
+        db.session.rollback()
+        error = True
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+        print(sys.exc_info())
+        print(e)
+    finally:
+        db.session.close()
+  
+    return render_template('pages/home.html')
+
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # DONE: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+    try:
+        cache_tags = venue_cache_tags(venue_id)
+        # The venue's shows are deleted with it, and leave their artists' counters
+        uncount_venue_shows(venue_id)
+        ShowFeed.query.filter_by(venue_id=venue_id).delete()
+        Show.query.filter_by(venue_id=venue_id).delete()
+        Match.query.filter_by(venue_id=venue_id).delete()
+        # Bulk deletes skip the ORM cascade, and SQLite does not enforce the
+        # foreign key one
+        VenueGenre.query.filter_by(venue_id=venue_id).delete()
+        Venue.query.filter_by(id=venue_id).delete()
+        db.session.commit()
+        page_cache.invalidate(*cache_tags)
+        autocomplete.remove('venue', venue_id)
+        
+    except Exception as e:
+        db.session.rollback()
+        error = True
+        print(sys.exc_info())
+        print(e)
+        return jsonify({ 'success': False })
+    finally:
+        db.session.close()
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return jsonify({ 'success': True })
+
+#  Artists
+#  ----------------------------------------------------------------
+@bp.route('/artists')
+@page_cache.cached(tags=lambda: ['artists'])
+def artists():
+    # DONE: replace with real data returned from querying the database
+    query = Artist.query.with_entities(Artist.id, Artist.name)
+    genre = genre_arg()
+    if genre:
+        # Uses the (genre, artist_id) index on ArtistGenre
+        query = query.join(ArtistGenre, db.and_(ArtistGenre.artist_id == Artist.id, ArtistGenre.genre == genre))
+    page = paginate(query, [Artist.name, Artist.id])
+    return render_template('pages/artists.html', artists=page.items, page=page)
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+def search_artists():
+    # DONE: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+    # Further pages are requested with GET and carry the term in the url
+    response = {}
+    term = request.values.get('search_term', '')
+    # Nested shows and genres are loaded for all matches at once, so broad
+    # terms don't cost one query per artist
+    query, keys = search(Artist, term)
+    page = paginate(query.options(
+        db.selectinload(Artist.shows),
+        db.selectinload(Artist.genre_links)
+    ), keys)
+    response['data'] = artists_schema.dump(page.items)
+    response['count'] = len(response['data'])
+
+    return render_template('pages/search_artists.html', results=response, search_term=term, page=page)
+
+@bp.route('/artists/<int:artist_id>')
+@page_cache.cached(tags=lambda artist_id: [f'artist:{artist_id}'])
+def show_artist(artist_id):
+    # shows the venue page with the given venue_id
+    # DONE: replace with real venue data from the venues table, using venue_id
+
+    artist = Artist.get_with_shows_or_404(artist_id)
+    past, upcoming = split_shows(artist.shows)
+    if upcoming:
+        # The cached page is stale once its next show is a past show
+        expire_at(upcoming[0].start_time)
+    data = artist_schema.dump(artist)
+    past_shows = []
+    upcoming_shows = []
+    for show in past:
+        show_json = {}
+        show_json['venue_id'] = show.venue_id
+        show_json['venue_name'] = show.venue.name
+        show_json['venue_image_link'] = show.venue.image_link
+        show_json['start_time'] = show.start_time.isoformat()
+        past_shows.append(show_json)
+
+    data['past_shows'] = past_shows
+
+    for show in upcoming:
+        show_json = {}
+        show_json['venue_id'] = show.venue_id
+        show_json['venue_name'] = show.venue.name
+        show_json['venue_image_link'] = show.venue.image_link
+        show_json['start_time'] = show.start_time.isoformat()
+        upcoming_shows.append(show_json)
+
+    data['upcoming_shows'] = upcoming_shows
+
+    data['past_shows_count'] = len(past_shows)
+    data['upcoming_shows_count'] = len(upcoming_shows)
+
+    return render_template('pages/show_artist.html', artist=data)
+
+@bp.route('/artists/<int:artist_id>/suggested-venues')
+@page_cache.cached(tags=lambda artist_id: ['matches', f'artist:{artist_id}'], etag=True)
+def artist_suggested_venues(artist_id):
+    # Venues matching the artist, best first, as scored by the last
+    # rescore_matches run (see the Matchmaking section of models.py)
+    if db.session.query(Artist.id).filter(Artist.id == artist_id).scalar() is None:
+        abort(404)
+    return api_response([{
+        'id': venue.id,
+        'name': venue.name,
+        'city': venue.city,
+        'state': venue.state,
+        'seeking_talent': venue.seeking_talent,
+        'num_upcoming_shows': venue.upcoming_shows_count,
+        'score': round(venue.score, 3),
+        'url': url_for('.show_venue', venue_id=venue.id),
+    } for venue in suggested_venues(artist_id)])
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    # DONE: populate form with fields from artist with ID <artist_id>
+    artist = Artist.query.get_or_404(artist_id)
+    form = ArtistForm(obj=artist)
+   
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # DONE: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    
+    artist = Artist.query.get_or_404(artist_id)
+    form = ArtistForm(obj=artist)
+
+    if form.validate():
+        try:
+          artist.name=request.form['name']
+          artist.city=request.form['city']
+          artist.state=request.form['state']
+          artist.phone=request.form['phone']
+          # Genres are fetched as a list and stored one row per genre
+          artist.genres = request.form.getlist('genres')
+          artist.image_link=request.form['image_link']
+          artist.facebook_link=request.form['facebook_link']
+          artist.website=request.form['website']
+          artist.seeking_venue=True if request.form.get('seeking_venue') == 'y' else False
+          artist.seeking_description=request.form['seeking_description']
+
+          cache_tags = artist_cache_tags(artist_id)
+          db.session.add(artist)
+          refresh_feed_artist(artist)
+          db.session.commit()
+          page_cache.invalidate(*cache_tags)
+          autocomplete.add('artist', artist_id, request.form['name'])
+          flash('Artist ' + request.form['name'] + ' was successfully updated!')
+        except Exception as e:
+            db.session.rollback()
+            error = True
+            print(sys.exc_info())
+            flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated.')
+            print(sys.exc_info())
+            print(e)
+        finally:
+            db.session.close()
+    else:
+        flash(form.errors)
+        return redirect(url_for('.edit_artist', artist_id=artist_id))
+
+    return redirect(url_for('.show_artist', artist_id=artist_id))
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    # DONE: populate form with values from venue with ID <venue_id>
+    venue = Venue.query.get_or_404(venue_id)
+    form = VenueForm(obj=venue)
+  
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # DONE: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    venue = Venue.query.get_or_404(venue_id)
+    form = VenueForm()
+    print("Form validate", form.validate())
+    print(form.errors)
+    if form.validate_on_submit():
+        try:
+          print(request.form)
+          moved = (venue.city, venue.state) != (request.form['city'], request.form['state'])
+          venue.name=request.form['name']
+          venue.address=request.form['address']
+          venue.city=request.form['city']
+          venue.state=request.form['state']
+          venue.phone=request.form['phone']
+          # Genres are fetched as a list and stored one row per genre
+          venue.genres = request.form.getlist('genres')
+          venue.image_link=request.form['image_link']
+          venue.facebook_link=request.form['facebook_link']
+          venue.website=request.form['website']
+          venue.seeking_talent=True if request.form.get('seeking_talent') == 'y' else False
+          venue.seeking_description=request.form['seeking_description']
+          if moved or venue.latitude is None:
+              venue.locate()
+
+          cache_tags = venue_cache_tags(venue_id)
+          db.session.add(venue)
+          refresh_feed_venue(venue)
+          db.session.commit()
+          page_cache.invalidate(*cache_tags)
+          autocomplete.add('venue', venue_id, request.form['name'])
+          flash('Venue ' + request.form['name'] + ' was successfully updated!')
+        except Exception as e:
+            db.session.rollback()
+            error = True
+            print(sys.exc_info())
+            flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
+            print(sys.exc_info())
+            print(e)
+        finally:
+            db.session.close()
+    else:
+        flash(form.errors)
+        return redirect(url_for('.edit_venue', venue_id=venue_id))
+    
+    return redirect(url_for('.show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # DONE: insert form data as a new Venue record in the db, instead
+    # DONE: modify data to be the data object returned from db insertion
+
+    form = ArtistForm()
+    list_genres = request.form.getlist('genres')
+    if form.validate():
+        try:
+            new_artist = Artist(
+                name=request.form['name'],
+                city=request.form['city'],
+                state=request.form['state'],
+                phone=request.form['phone'],
+                # Genres are fetched as a list and stored one row per genre
+                genres = list_genres,
+                image_link=request.form['image_link'],
+                facebook_link=request.form['facebook_link'],
+                website=request.form['website'],
+                seeking_venue=True if request.form.get('seeking_venue') == 'y' else False,
+                seeking_description=request.form['seeking_description']
+            )
+
+            db.session.add(new_artist)
+            db.session.flush()
+            artist_id = new_artist.id
+            db.session.commit()
+            page_cache.invalidate('artists')
+            autocomplete.add('artist', artist_id, request.form['name'])
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] + ' was successfully listed!')
+
+        except Exception as e:
+            db.session.rollback()
+            error = True
+            print(sys.exc_info())
+            flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+            print(sys.exc_info())
+            print(e)
+        finally:
+            db.session.close()
+    else:
+        flash(form.errors)
+        return redirect(url_for('.create_artist_submission'))
+
+    return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@page_cache.cached(tags=lambda: ['shows'])
+def shows():
+    # displays list of shows at /shows
+    # DONE: replace with real venues data.
+    #       num_shows should be aggregated based on number of upcoming shows per venue.
+
+    page = upcoming_show_page()
+    if page.items:
+        # The cached page is stale once its first show is a past show
+        expire_at(page.items[0].start_time)
+    data = show_feed_schema.dump(page.items)
+
+    return render_template('pages/shows.html', shows=data, page=page)
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # DONE: insert form data as a new Show record in the db, instead
+
+    try:
+        start_time = dateutil.parser.parse(request.form['start_time'])
+        new_show = Show(
+            artist_id=int(request.form['artist_id']),
+            venue_id=int(request.form['venue_id']),
+            start_time=start_time,
+            end_time=start_time + show_duration(request.form.get('duration')),
+        )
+
+        # Updating the counters first locks the artist's and the venue's rows,
+        # so concurrent bookings of either wait for this one to commit
+        count_show(new_show)
+        conflicts = booking_conflicts(new_show.artist_id, new_show.venue_id, new_show.start_time, new_show.end_time)
+        if conflicts:
+            db.session.rollback()
+            for show in conflicts:
+                flash(describe_conflict(new_show.artist_id, show.artist_id, show.start_time, show.end_time))
+            flash('Show could not be listed.')
+            return render_template('pages/home.html')
+
+        db.session.add(new_show)
+        db.session.flush()
+        add_to_feed(Show.id == new_show.id, Show.start_time >= datetime.now())
+        db.session.commit()
+        page_cache.invalidate('shows', 'venues', f'artist:{new_show.artist_id}', f'venue:{new_show.venue_id}')
+        flash('Show was successfully listed!')
+
+    except Exception as e:
+        db.session.rollback()
+        error = True
+        print(sys.exc_info())
+        flash('An error occurred. Show could not be listed.')
+        print(sys.exc_info())
+        print(e)
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+@bp.route('/shows/import', methods=['GET'])
+def import_shows_form():
+    return render_template('forms/import_shows.html')
+
+@bp.route('/shows/import', methods=['POST'])
+def import_shows_submission():
+    # Imports a CSV or NDJSON file, uploaded in the "file" field of a form or
+    # sent as the request body, and returns the report as JSON
+    upload = request.files.get('file')
+    if upload:
+        stream, format = upload.stream, import_format(upload.filename, upload.mimetype)
+    else:
+        stream, format = request.stream, import_format(mimetype=request.mimetype)
+    if format is None:
+        abort(400)
+    return api_response(import_shows(read_import(stream, format)))
+
+#  API
+#  ----------------------------------------------------------------
+
+# Read-only JSON API. Responses are cached like the pages and carry an ETag,
+# so a client revalidating an unchanged resource gets a 304 without the
+# resource being queried nor serialized again.
+
+def api_response(data, page=None):
+    payload = {'data': data}
+    if page is not None:
+        payload['next'] = page.next_url
+        payload['prev'] = page.prev_url
+    response = Response(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+    # Clients may keep the response but revalidate it before each use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/api/v1/artists')
+@page_cache.cached(tags=lambda: ['artists', 'shows'], etag=True)
+def api_artists():
+    query = Artist.query.options(db.selectinload(Artist.shows), db.selectinload(Artist.genre_links))
+    genre = genre_arg()
+    if genre:
+        query = query.join(ArtistGenre, db.and_(ArtistGenre.artist_id == Artist.id, ArtistGenre.genre == genre))
+    page = paginate(query, [Artist.name, Artist.id])
+    return api_response(api_artist_schema.dump(page.items, many=True), page)
+
+@bp.route('/api/v1/artists/<int:artist_id>')
+@page_cache.cached(tags=lambda artist_id: [f'artist:{artist_id}'], etag=True)
+def api_show_artist(artist_id):
+    artist = Artist.get_with_shows_or_404(artist_id)
+    past, upcoming = split_shows(artist.shows)
+    if upcoming:
+        expire_at(upcoming[0].start_time)
+    return api_response(api_artist_schema.dump(artist))
+
+@bp.route('/api/v1/venues')
+@page_cache.cached(tags=lambda: ['venues'], etag=True)
+def api_venues():
+    query = Venue.query.options(db.selectinload(Venue.genre_links))
+    genre = genre_arg()
+    if genre:
+        query = query.join(VenueGenre, db.and_(VenueGenre.venue_id == Venue.id, VenueGenre.genre == genre))
+    page = paginate(query, [Venue.state, Venue.city, Venue.name, Venue.id])
+    return api_response(api_venue_schema.dump(page.items, many=True), page)
+
+@bp.route('/api/v1/venues/<int:venue_id>')
+@page_cache.cached(tags=lambda venue_id: [f'venue:{venue_id}'], etag=True)
+def api_show_venue(venue_id):
+    venue = Venue.get_with_shows_or_404(venue_id)
+    past, upcoming = split_shows(venue.shows)
+    if upcoming:
+        expire_at(upcoming[0].start_time)
+    return api_response(api_venue_detail_schema.dump(venue))
+
+@bp.route('/api/v1/shows')
+@page_cache.cached(tags=lambda: ['shows'], etag=True)
+def api_shows():
+    page = upcoming_show_page()
+    if page.items:
+        expire_at(page.items[0].start_time)
+    return api_response(api_show_feed_schema.dump(page.items, many=True), page)
+
+@bp.route('/api/v1/shows/<int:show_id>')
+@page_cache.cached(tags=lambda show_id: ['shows'], etag=True)
+def api_show_show(show_id):
+    show = Show.query.options(db.joinedload(Show.artist), db.joinedload(Show.venue)).filter(
+        Show.id == show_id
+    ).first_or_404()
+    return api_response(api_show_schema.dump(show))
+
+@bp.route('/api/v1/export/<any(artists, venues, shows):kind>')
+def api_export(kind):
+    # Full dump, see the Export section: ?format=ndjson (default) or csv,
+    # ?gzip=1 and, for shows, a ?from= and ?to= range of start times. Not
+    # cached, the response is streamed as it is read.
+    format = request.args.get('format', 'ndjson')
+    if format not in EXPORT_FORMATS:
+        abort(400)
+    compress = request.args.get('gzip') in ('1', 'true')
+    start_time = datetime_arg('from')
+    end_time = datetime_arg('to')
+    if kind != 'shows' and (start_time or end_time):
+        abort(400)
+    filename = f'{kind}.{format}.gz' if compress else f'{kind}.{format}'
+    response = Response(
+        stream_with_context(export_chunks(kind, format, compress, start_time, end_time)),
+        mimetype='application/gzip' if compress else EXPORT_FORMATS[format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@bp.route('/autocomplete')
+def autocomplete_suggestions():
+    # Artists and venues with a name word starting with each word of ?q=, up
+    # to ?limit= of them, served from the in-memory index (autocomplete.py)
+    limit = min(max(request.args.get('limit', current_app.config.get('AUTOCOMPLETE_LIMIT', 10), type=int), 1), 50)
+    suggestions = [
+        {'type': kind, 'id': id, 'name': name, 'url': url_for(f'.show_{kind}', **{f'{kind}_id': id})}
+        for kind, id, name in autocomplete.suggest(request.args.get('q', ''), limit)
+    ]
+    return api_response(suggestions)
+
+@bp.route('/metrics')
+def metrics():
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500